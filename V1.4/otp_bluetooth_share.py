@@ -424,6 +424,7 @@ class OTPBluetoothShareApp:
                 fg='#c9d1d9', bg='#0d1117').pack(anchor='w', pady=(0, 5))
         
         contacts_with_pads = get_contacts_with_pads()
+        self.send_contact_ids = contacts_with_pads  # Same order as the combobox entries
         self.send_contact_var = tk.StringVar()
         
         if contacts_with_pads:
@@ -470,7 +471,8 @@ class OTPBluetoothShareApp:
                 fg='#c9d1d9', bg='#0d1117').pack(anchor='w', pady=(0, 5))
         
         self.recv_contact_var = tk.StringVar()
-        options = [f"{get_contact_name(cid, self.contacts)} ({cid})" for cid in self.contacts.keys()]
+        self.recv_contact_ids = list(self.contacts.keys())  # Same order as the combobox entries
+        options = [f"{get_contact_name(cid, self.contacts)} ({cid})" for cid in self.recv_contact_ids]
         
         if options:
             self.recv_combo = ttk.Combobox(c, textvariable=self.recv_contact_var,
@@ -543,7 +545,7 @@ class OTPBluetoothShareApp:
         if not self.selected_device or not self.send_contact_var.get():
             return
         
-        contact_id = self.send_contact_var.get().split('(')[1].split(')')[0]
+        contact_id = self.send_contact_ids[self.send_combo.current()]
         pages = get_pad_pages(contact_id)
         
         if not pages:
@@ -571,7 +573,7 @@ class OTPBluetoothShareApp:
         if not self.recv_combo:
             return
         
-        contact_id = self.recv_contact_var.get().split('(')[-1].rstrip(')')
+        contact_id = self.recv_contact_ids[self.recv_combo.current()]
         
         self.recv_btn.pack_forget()
         self.stop_btn.pack(pady=5)
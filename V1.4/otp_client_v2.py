@@ -15,6 +15,7 @@ Security:
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import socket
+import struct
 import threading
 import os
 import json
@@ -41,6 +42,48 @@ CREDENTIALS_FILE = APP_DIR / "credentials.txt"
 CONTACTS_FILE = APP_DIR / "contacts.json"
 PAGE_ID_LENGTH = 8
 
+# The relay stream is framed: tag + payload length, then the payload
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_TEXT = ord("T")      # UTF-8 protocol string (sender|payload, SYSTEM|...)
+MAX_FRAME_SIZE = 1024 * 1024
+
+
+# --- FRAMING ---
+
+def recv_exact(sock, size: int):
+    """Read exactly size bytes, or return None if the peer closed first."""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return buf
+
+
+def read_frame(sock):
+    """Read one (tag, payload) frame from the server, or None on disconnect."""
+    header = recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    
+    tag, length = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"frame of {length} bytes exceeds limit")
+    
+    payload = recv_exact(sock, length)
+    if payload is None:
+        return None
+    return tag, payload
+
+
+def pack_text_frame(message: str) -> bytes:
+    """Frame a protocol string for the relay."""
+    data = message.encode("utf-8")
+    return FRAME_HEADER.pack(FRAME_TEXT, len(data)) + data
+
 
 # --- ENCRYPTION ---
 
@@ -347,6 +390,10 @@ class OTPClientGUI:
             messagebox.showwarning("Warning", "Fill in all fields")
             return
         
+        if "|" in username:
+            messagebox.showwarning("Warning", "Username cannot contain '|'")
+            return
+        
         try:
             port = int(port_str)
         except ValueError:
@@ -361,8 +408,12 @@ class OTPClientGUI:
             self.client_socket.connect((host, port))
             self.client_socket.settimeout(None)
             
-            self.client_socket.sendall(username.encode('utf-8'))
-            response = self.client_socket.recv(1024).decode('utf-8')
+            # Send username, asking for a framed stream
+            self.client_socket.sendall(f"{username}|FRAMED".encode('utf-8'))
+            frame = read_frame(self.client_socket)
+            if frame is None:
+                raise Exception("Server closed the connection")
+            response = frame[1].decode('utf-8')
             
             if response.startswith("ERROR"):
                 self.add_message(f"Failed: {response}", "error")
@@ -465,7 +516,7 @@ class OTPClientGUI:
         full_msg = f"{recipient}|{page_id}:{encrypted}"
         
         try:
-            self.client_socket.sendall(full_msg.encode('utf-8'))
+            self.client_socket.sendall(pack_text_frame(full_msg))
             self.message_entry.delete(0, tk.END)
             
             name = get_contact_name(recipient, self.contacts)
@@ -481,11 +532,13 @@ class OTPClientGUI:
         """Background thread to receive messages."""
         while self.connected and self.client_socket:
             try:
-                data = self.client_socket.recv(8192)
-                if not data:
+                frame = read_frame(self.client_socket)
+                if frame is None:
                     break
                 
-                self.process_message(data.decode('utf-8'))
+                tag, payload = frame
+                if tag == FRAME_TEXT:
+                    self.process_message(payload.decode('utf-8'))
                 
             except ConnectionResetError:
                 break
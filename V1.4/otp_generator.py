@@ -12,58 +12,65 @@ Usage: python3 otp_generator.py
 import tkinter as tk
 from tkinter import messagebox
 import string
+import math
 import os
 import sys
+import threading
 from pathlib import Path
 
 # --- CONFIGURATION ---
 PI_HWRNG_DEVICE = "/dev/hwrng"
 URANDOM_DEVICE = "/dev/urandom"
 OUTPUT_FILENAME = "otp_cipher.txt"
+OUTPUT_BUFFER_SIZE = 1 << 20  # Write the pad in 1 MB chunks rather than 8 KB
 PAGE_LENGTH = 3500
+STATUS_INTERVAL = 100  # Pages between progress updates
 PAGE_ID_LENGTH = 8
 
+# Character set: A-Z, 0-9, and punctuation (Total: 68 chars)
+CHARSET = string.ascii_uppercase + string.digits + string.punctuation
+
+# Rejection Sampling Math:
+# We want uniform distribution for 68 options.
+# The max multiple of 68 that fits in a byte (0-255) is 204 (68 * 3).
+# We must discard any byte >= 204 to maintain perfect cryptographic fairness.
+REJECTION_LIMIT = (256 // len(CHARSET)) * len(CHARSET)
+
+# bytes.translate does the sampling in C: the delete set drops rejected
+# bytes, and the table maps each accepted byte to CHARSET[byte % 68]
+CHARSET_TABLE = bytes(CHARSET.encode('ascii')[byte % len(CHARSET)] for byte in range(256))
+REJECTED_BYTES = bytes(range(REJECTION_LIMIT, 256))
+
 # --- CORE GENERATION LOGIC ---
 
+def entropy_read_size(needed, limit):
+    """
+    Bytes to read so rejection sampling with the given limit yields
+    needed characters in one read: the expected count plus seven standard
+    deviations, so a second read is practically never required.
+    """
+    expected = needed * 256 / limit
+    return math.ceil(expected + 7 * math.sqrt(expected))
+
+
 def generate_random_page(rng_file, length, include_id=True):
     """
     Generate a string using randomness from the RNG device.
     Uses rejection sampling to map 0-255 bytes to the character set
     without bias.
     """
-    # Character set: A-Z, 0-9, and punctuation (Total: 68 chars)
-    chars = string.ascii_uppercase + string.digits + string.punctuation
-    charset_len = len(chars)  # 68
-    
-    # Rejection Sampling Math:
-    # We want uniform distribution for 68 options.
-    # The max multiple of 68 that fits in a byte (0-255) is 204 (68 * 3).
-    # We must discard any byte >= 204 to maintain perfect cryptographic fairness.
-    limit = 204
-    
-    result = []
-    needed = length
-    
+    result = bytearray()
     while len(result) < length:
         # Read a chunk of raw entropy
-        chunk_size = needed * 4  
-        raw_bytes = rng_file.read(chunk_size)
+        needed = length - len(result)
+        raw_bytes = rng_file.read(entropy_read_size(needed, REJECTION_LIMIT))
         
         if not raw_bytes:
             raise IOError("Failed to read from RNG device.")
-            
-        for byte in raw_bytes:
-            if byte < limit:
-                # Map byte to character index
-                char_index = byte % charset_len
-                result.append(chars[char_index])
-                
-                if len(result) == length:
-                    break
-                    
-        needed = length - len(result)
+        
+        result += raw_bytes.translate(CHARSET_TABLE, REJECTED_BYTES)[:needed]
     
-    page_content = "".join(result)
+    page_content = result.decode('ascii')
     
     # Add page ID prefix if requested
     if include_id:
@@ -104,14 +111,16 @@ def generate_otp_file(num_pages, rng_device, status_callback=None):
     output_path = Path(OUTPUT_FILENAME)
     
     try:
-        with open(rng_device, "rb") as rng, output_path.open("w", encoding="utf-8") as file:
+        # Unbuffered: each page is one read() straight from the device
+        with open(rng_device, "rb", buffering=0) as rng, \
+                output_path.open("w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE) as file:
             for i in range(1, num_pages + 1):
                 # Generate random content with page ID
                 otp_page = generate_random_page(rng, PAGE_LENGTH)
                 file.write(otp_page + "\n")
                 
                 # Update UI periodically
-                if status_callback and i % 10 == 0:
+                if status_callback and i % STATUS_INTERVAL == 0:
                     status_callback(i, num_pages)
                     
     except PermissionError:
@@ -220,9 +229,9 @@ class OTPGeneratorApp:
         self.status_label.pack(pady=5)
 
     def update_status(self, current, total):
-        """Callback to update GUI during generation."""
-        self.status_label.config(text=f"Generating... {current}/{total} pages")
-        self.master.update()
+        """Callback to update GUI during generation (called from the worker thread)."""
+        text = f"Generating... {current}/{total} pages"
+        self.master.after(0, lambda: self.status_label.config(text=text))
 
     def generate_otp_action(self):
         # Validate num_pages
@@ -237,31 +246,40 @@ class OTPGeneratorApp:
         # Disable button during generation
         self.generate_button.config(state="disabled")
         self.status_label.config(text=f"Using {self.rng_name}...", fg='#58a6ff')
-        self.master.update()
 
-        try:
-            output_path = generate_otp_file(
-                num_pages=num_pages,
-                rng_device=self.rng_device,
-                status_callback=self.update_status
-            )
-            self.status_label.config(text=f"Done! Saved {num_pages} pages", fg='#3fb950')
-            messagebox.showinfo(
-                "Success", 
-                f"Generated {num_pages} pages.\n\nSaved to: {output_path}\n\nRNG used: {self.rng_name}"
-            )
-            
-        except PermissionError:
-            self.status_label.config(text="Error: Permission denied", fg='#f85149')
-            messagebox.showerror(
-                "Permission Error", 
-                f"Cannot access {self.rng_device}.\n\nTry running with: sudo python3 otp_generator.py"
-            )
-        except Exception as e:
-            self.status_label.config(text="Error occurred", fg='#f85149')
-            messagebox.showerror("Error", f"An error occurred:\n{e}")
-        finally:
+        def on_done(output_path, error):
             self.generate_button.config(state="normal")
+            
+            if isinstance(error, PermissionError):
+                self.status_label.config(text="Error: Permission denied", fg='#f85149')
+                messagebox.showerror(
+                    "Permission Error", 
+                    f"Cannot access {self.rng_device}.\n\nTry running with: sudo python3 otp_generator.py"
+                )
+            elif error:
+                self.status_label.config(text="Error occurred", fg='#f85149')
+                messagebox.showerror("Error", f"An error occurred:\n{error}")
+            else:
+                self.status_label.config(text=f"Done! Saved {num_pages} pages", fg='#3fb950')
+                messagebox.showinfo(
+                    "Success", 
+                    f"Generated {num_pages} pages.\n\nSaved to: {output_path}\n\nRNG used: {self.rng_name}"
+                )
+        
+        def work():
+            output_path, error = None, None
+            try:
+                output_path = generate_otp_file(
+                    num_pages=num_pages,
+                    rng_device=self.rng_device,
+                    status_callback=self.update_status
+                )
+            except Exception as e:
+                error = e
+            self.master.after(0, lambda: on_done(output_path, error))
+        
+        # Generate in the background so the UI stays responsive
+        threading.Thread(target=work, daemon=True).start()
 
 
 def main():
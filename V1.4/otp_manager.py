@@ -27,10 +27,14 @@ import json
 import os
 import shutil
 import string
+import math
 import hashlib
+import subprocess
+import sys
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Tuple, Callable
 
 # --- CONFIGURATION ---
 APP_DIR = Path(__file__).parent.resolve()
@@ -38,6 +42,7 @@ OTP_DATA_DIR = APP_DIR / "otp_data"
 CONTACTS_DIR = OTP_DATA_DIR / "contacts"
 CONTACTS_FILE = APP_DIR / "contacts.json"
 DEVICE_CONFIG_FILE = APP_DIR / "device_config.json"
+BLUETOOTH_APP = str(APP_DIR / "otp_bluetooth_share.py")
 
 # Legacy files for migration
 LEGACY_OTP_FILE = APP_DIR / "otp_cipher.txt"
@@ -45,11 +50,25 @@ LEGACY_USED_FILE = APP_DIR / "used_pages.txt"
 
 PAGE_ID_LENGTH = 8
 DEFAULT_PAGE_LENGTH = 3500
+PROGRESS_INTERVAL = 100  # Pages between progress callbacks during generation
+PAD_WRITE_BUFFER = 1 << 20  # Pad files are tens of MB; write them in 1 MB chunks
 
 # Hardware RNG (Raspberry Pi)
 PI_HWRNG_DEVICE = "/dev/hwrng"
 
 
+# --- RANDOMNESS ---
+
+def entropy_read_size(needed, limit):
+    """
+    Bytes to read so rejection sampling with the given limit yields
+    needed characters in one read: the expected count plus seven standard
+    deviations, so a second read is practically never required.
+    """
+    expected = needed * 256 / limit
+    return math.ceil(expected + 7 * math.sqrt(expected))
+
+
 # --- PER-CONTACT PAD MANAGEMENT ---
 
 class ContactPadManager:
@@ -141,6 +160,12 @@ class ContactPadManager:
         with open(cipher_file, 'r') as f:
             return [line.rstrip('\n') for line in f if len(line.strip()) > PAGE_ID_LENGTH]
     
+    def write_pages(self, cipher_file: Path, pages: List[str]):
+        """Write pages to a cipher file, one per line."""
+        with open(cipher_file, 'w', buffering=PAD_WRITE_BUFFER) as f:
+            for page in pages:
+                f.write(page + '\n')
+    
     def get_used_page_ids(self, contact_id: str) -> set:
         """Get set of used page IDs for a contact."""
         used_file = self.get_used_file(contact_id)
@@ -195,7 +220,9 @@ class ContactPadManager:
     # --- Pad Generation ---
     
     def generate_pad_for_contact(self, contact_id: str, num_pages: int, 
-                                  use_hwrng: bool = True) -> Tuple[bool, str]:
+                                  use_hwrng: bool = True,
+                                  progress_callback: Optional[Callable[[int, int], None]] = None
+                                  ) -> Tuple[bool, str]:
         """
         Generate a new cipher pad for a contact.
         
@@ -203,6 +230,8 @@ class ContactPadManager:
             contact_id: The contact's ID
             num_pages: Number of pages to generate
             use_hwrng: Use hardware RNG if available
+            progress_callback: Called as (pages_done, num_pages) every
+                PROGRESS_INTERVAL pages. Runs on the generating thread.
             
         Returns:
             (success, message)
@@ -214,12 +243,10 @@ class ContactPadManager:
             return False, "Contact already has a cipher pad. Delete it first to generate a new one."
         
         try:
-            pages = self._generate_pages(num_pages, use_hwrng)
+            pages = self._generate_pages(num_pages, use_hwrng, progress_callback)
             
             # Write to cipher file
-            with open(cipher_file, 'w') as f:
-                for page in pages:
-                    f.write(page + '\n')
+            self.write_pages(cipher_file, pages)
             
             # Clear any used pages tracker
             used_file = self.get_used_file(contact_id)
@@ -240,7 +267,8 @@ class ContactPadManager:
         except Exception as e:
             return False, f"Generation failed: {e}"
     
-    def _generate_pages(self, num_pages: int, use_hwrng: bool = True) -> List[str]:
+    def _generate_pages(self, num_pages: int, use_hwrng: bool = True,
+                        progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
         """Generate random OTP pages."""
         chars = string.ascii_uppercase + string.digits + string.punctuation
         charset_len = len(chars)  # 68
@@ -249,35 +277,46 @@ class ContactPadManager:
         # Try hardware RNG first
         if use_hwrng and os.path.exists(PI_HWRNG_DEVICE):
             try:
-                pages = self._generate_hwrng_pages(num_pages, chars, charset_len)
+                pages = self._generate_hwrng_pages(num_pages, chars, charset_len, progress_callback)
                 return pages
             except Exception as e:
                 print(f"HWRNG failed, falling back to urandom: {e}")
         
         # Fallback to /dev/urandom
-        pages = self._generate_urandom_pages(num_pages, chars, charset_len)
+        pages = self._generate_urandom_pages(num_pages, chars, charset_len, progress_callback)
         return pages
     
-    def _generate_hwrng_pages(self, num_pages: int, chars: str, charset_len: int) -> List[str]:
+    def _generate_hwrng_pages(self, num_pages: int, chars: str, charset_len: int,
+                              progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
         """Generate pages using hardware RNG."""
         limit = (256 // charset_len) * charset_len  # Rejection sampling limit
         pages = []
         
-        with open(PI_HWRNG_DEVICE, 'rb') as rng:
+        # bytes.translate does the sampling in C: the delete set drops
+        # rejected bytes, and the table maps the rest to chars[byte % len]
+        char_codes = chars.encode('ascii')
+        table = bytes(char_codes[byte % charset_len] for byte in range(256))
+        rejected = bytes(range(limit, 256))
+        
+        # Unbuffered: each page is one read() straight from the device
+        with open(PI_HWRNG_DEVICE, 'rb', buffering=0) as rng:
             for _ in range(num_pages):
-                page_chars = []
-                while len(page_chars) < DEFAULT_PAGE_LENGTH:
-                    raw_bytes = rng.read((DEFAULT_PAGE_LENGTH - len(page_chars)) * 4)
-                    for byte in raw_bytes:
-                        if byte < limit:
-                            page_chars.append(chars[byte % charset_len])
-                            if len(page_chars) >= DEFAULT_PAGE_LENGTH:
-                                break
-                pages.append(''.join(page_chars))
+                page = bytearray()
+                while len(page) < DEFAULT_PAGE_LENGTH:
+                    needed = DEFAULT_PAGE_LENGTH - len(page)
+                    raw_bytes = rng.read(entropy_read_size(needed, limit))
+                    if not raw_bytes:
+                        raise IOError("Failed to read from RNG device.")
+                    page += raw_bytes.translate(table, rejected)[:needed]
+                pages.append(page.decode('ascii'))
+                
+                if progress_callback and len(pages) % PROGRESS_INTERVAL == 0:
+                    progress_callback(len(pages), num_pages)
         
         return pages
     
-    def _generate_urandom_pages(self, num_pages: int, chars: str, charset_len: int) -> List[str]:
+    def _generate_urandom_pages(self, num_pages: int, chars: str, charset_len: int,
+                                progress_callback: Optional[Callable[[int, int], None]] = None) -> List[str]:
         """Generate pages using /dev/urandom."""
         import secrets
         pages = []
@@ -285,6 +324,9 @@ class ContactPadManager:
         for _ in range(num_pages):
             page = ''.join(secrets.choice(chars) for _ in range(DEFAULT_PAGE_LENGTH))
             pages.append(page)
+            
+            if progress_callback and len(pages) % PROGRESS_INTERVAL == 0:
+                progress_callback(len(pages), num_pages)
         
         return pages
     
@@ -311,9 +353,7 @@ class ContactPadManager:
         
         try:
             # Write pages
-            with open(cipher_file, 'w') as f:
-                for page in pages:
-                    f.write(page + '\n')
+            self.write_pages(cipher_file, pages)
             
             # Clear used pages
             used_file = self.get_used_file(contact_id)
@@ -365,9 +405,7 @@ class ContactPadManager:
         
         # Rewrite cipher file
         cipher_file = self.get_cipher_file(contact_id)
-        with open(cipher_file, 'w') as f:
-            for page in remaining:
-                f.write(page + '\n')
+        self.write_pages(cipher_file, remaining)
         
         # Clear used tracker
         used_file = self.get_used_file(contact_id)
@@ -459,13 +497,62 @@ class OTPManagerApp:
         self.master.minsize(850, 600)
         self.master.configure(bg='#0d1117')
         
+        # Screen size for centering dialogs (avoids a round-trip per dialog)
+        self.screen_width = self.master.winfo_screenwidth()
+        self.screen_height = self.master.winfo_screenheight()
+        
         self.manager = ContactPadManager()
         self.contacts = load_contacts()
         self.selected_contact = None
+        self.refresh_pending = False
         
+        self.setup_styles()
         self.setup_ui()
         self.refresh_all()
     
+    def setup_styles(self):
+        """Configure ttk styles once, shared by the main window and dialogs."""
+        style = ttk.Style()
+        style.theme_use('clam')
+        
+        # Treeview
+        style.configure('Treeview',
+                       background='#0d1117',
+                       foreground='#c9d1d9',
+                       fieldbackground='#0d1117',
+                       rowheight=28)
+        style.configure('Treeview.Heading',
+                       background='#21262d',
+                       foreground='#c9d1d9',
+                       relief='flat')
+        style.map('Treeview', background=[('selected', '#1f6feb')])
+        
+        # Dialog labels
+        style.configure('Dialog.TLabel',
+                       background='#0d1117',
+                       foreground='#c9d1d9',
+                       font=("Helvetica", 11))
+        style.configure('Title.Dialog.TLabel', font=("Helvetica", 14, "bold"))
+        style.configure('Info.Dialog.TLabel', foreground='#8b949e', font=("Helvetica", 10))
+        style.configure('Hint.Dialog.TLabel', foreground='#8b949e', font=("Helvetica", 9))
+        style.configure('Error.Dialog.TLabel', foreground='#f85149', font=("Helvetica", 10))
+        
+        # Dialog buttons
+        style.configure('Green.TButton',
+                       background='#238636',
+                       foreground='white',
+                       font=("Helvetica", 11),
+                       relief='flat',
+                       padding=(20, 8))
+        style.map('Green.TButton', background=[('disabled', '#21262d'), ('active', '#2ea043')])
+        style.configure('Dark.TButton',
+                       background='#21262d',
+                       foreground='#c9d1d9',
+                       font=("Helvetica", 11),
+                       relief='flat',
+                       padding=(20, 8))
+        style.map('Dark.TButton', background=[('active', '#30363d')])
+    
     def setup_ui(self):
         """Build the user interface."""
         main = tk.Frame(self.master, bg='#0d1117')
@@ -592,7 +679,8 @@ class OTPManagerApp:
             activeforeground='white',
             relief='flat',
             cursor='hand2',
-            pady=8
+            pady=8,
+            state=tk.NORMAL if os.path.exists(BLUETOOTH_APP) else tk.DISABLED
         ).pack(fill=tk.X)
     
     def setup_right_panel(self, parent):
@@ -692,20 +780,6 @@ class OTPManagerApp:
         self.pages_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
-        # Style treeview
-        style = ttk.Style()
-        style.theme_use('clam')
-        style.configure('Treeview',
-                       background='#0d1117',
-                       foreground='#c9d1d9',
-                       fieldbackground='#0d1117',
-                       rowheight=28)
-        style.configure('Treeview.Heading',
-                       background='#21262d',
-                       foreground='#c9d1d9',
-                       relief='flat')
-        style.map('Treeview', background=[('selected', '#1f6feb')])
-        
         # Action buttons
         actions = tk.Frame(parent, bg='#161b22')
         actions.pack(fill=tk.X, padx=15, pady=(0, 15))
@@ -761,6 +835,20 @@ class OTPManagerApp:
         )
         self.delete_btn.pack(side=tk.LEFT)
     
+    def schedule_refresh(self):
+        """Refresh all displays once the event loop is idle.
+        
+        Several calls before then collapse into a single refresh_all().
+        """
+        if self.refresh_pending:
+            return
+        self.refresh_pending = True
+        self.master.after_idle(self._do_refresh)
+    
+    def _do_refresh(self):
+        self.refresh_pending = False
+        self.refresh_all()
+    
     def refresh_all(self):
         """Refresh all displays."""
         self.refresh_stats()
@@ -882,6 +970,7 @@ class OTPManagerApp:
         all_contacts = list(self.contacts.keys())
         contacts_with_pads = set(self.manager.get_all_contacts_with_pads())
         contacts_without_pads = [c for c in all_contacts if c not in contacts_with_pads]
+        name_of = {cid: get_contact_name(cid, self.contacts) for cid in all_contacts}
         
         if not contacts_without_pads and not all_contacts:
             messagebox.showinfo(
@@ -893,53 +982,41 @@ class OTPManagerApp:
         # Dialog
         dialog = tk.Toplevel(self.master)
         dialog.title("Generate New Pad")
-        dialog.geometry("450x350")
+        dialog.geometry("450x380")
         dialog.resizable(False, False)
         dialog.configure(bg='#0d1117')
         dialog.transient(self.master)
         dialog.grab_set()
         
-        # Center
-        dialog.update_idletasks()
-        x = (dialog.winfo_screenwidth() - 450) // 2
-        y = (dialog.winfo_screenheight() - 350) // 2
+        # Center (size is fixed above, so no need to wait for a layout pass)
+        x = (self.screen_width - 450) // 2
+        y = (self.screen_height - 380) // 2
         dialog.geometry(f"+{x}+{y}")
         
         # Content
-        tk.Label(
+        ttk.Label(
             dialog,
             text="Generate New Cipher Pad",
-            font=("Helvetica", 14, "bold"),
-            fg='#c9d1d9',
-            bg='#0d1117'
+            style='Title.Dialog.TLabel'
         ).pack(pady=(20, 10))
         
-        tk.Label(
+        ttk.Label(
             dialog,
             text="This will create a unique pad for one contact.\n"
                  "Share this pad via Bluetooth when you meet them.",
-            font=("Helvetica", 10),
-            fg='#8b949e',
-            bg='#0d1117'
+            style='Info.Dialog.TLabel',
+            justify=tk.CENTER
         ).pack(pady=(0, 20))
         
         # Contact selection
         contact_frame = tk.Frame(dialog, bg='#0d1117')
         contact_frame.pack(fill=tk.X, padx=30, pady=(0, 15))
         
-        tk.Label(
-            contact_frame,
-            text="Contact:",
-            font=("Helvetica", 11),
-            fg='#c9d1d9',
-            bg='#0d1117'
-        ).pack(anchor='w')
-        
-        contact_var = tk.StringVar()
+        ttk.Label(contact_frame, text="Contact:", style='Dialog.TLabel').pack(anchor='w')
         
         # Show all contacts but warn about existing pads
         contact_options = [
-            f"{get_contact_name(cid, self.contacts)} ({cid})" + 
+            f"{name_of[cid]} ({cid})" + 
             (" [!] has pad" if cid in contacts_with_pads else "")
             for cid in all_contacts
         ]
@@ -947,7 +1024,6 @@ class OTPManagerApp:
         if contact_options:
             contact_combo = ttk.Combobox(
                 contact_frame,
-                textvariable=contact_var,
                 values=contact_options,
                 state='readonly',
                 width=40
@@ -962,12 +1038,10 @@ class OTPManagerApp:
             else:
                 contact_combo.current(0)
         else:
-            tk.Label(
+            ttk.Label(
                 contact_frame,
                 text="No contacts available",
-                font=("Helvetica", 10),
-                fg='#f85149',
-                bg='#0d1117'
+                style='Error.Dialog.TLabel'
             ).pack(anchor='w')
             return
         
@@ -975,13 +1049,7 @@ class OTPManagerApp:
         num_frame = tk.Frame(dialog, bg='#0d1117')
         num_frame.pack(fill=tk.X, padx=30, pady=(0, 15))
         
-        tk.Label(
-            num_frame,
-            text="Number of pages:",
-            font=("Helvetica", 11),
-            fg='#c9d1d9',
-            bg='#0d1117'
-        ).pack(anchor='w')
+        ttk.Label(num_frame, text="Number of pages:", style='Dialog.TLabel').pack(anchor='w')
         
         num_var = tk.StringVar(value="1000")
         tk.Entry(
@@ -995,14 +1063,16 @@ class OTPManagerApp:
             width=15
         ).pack(anchor='w', pady=(5, 0))
         
-        tk.Label(
+        ttk.Label(
             num_frame,
             text="Recommended: 1000+ pages per contact",
-            font=("Helvetica", 9),
-            fg='#8b949e',
-            bg='#0d1117'
+            style='Hint.Dialog.TLabel'
         ).pack(anchor='w', pady=(5, 0))
         
+        # Progress
+        progress = ttk.Progressbar(dialog, mode='determinate')
+        progress.pack(fill=tk.X, padx=30)
+        
         # Buttons
         btn_frame = tk.Frame(dialog, bg='#0d1117')
         btn_frame.pack(pady=20)
@@ -1016,65 +1086,70 @@ class OTPManagerApp:
                 messagebox.showerror("Error", "Please enter a valid number")
                 return
             
-            # Extract contact ID
-            selection = contact_var.get()
-            contact_id = selection.split('(')[-1].rstrip(')').replace(' [!] has pad', '')
+            # Combobox entries are in the same order as all_contacts
+            contact_id = all_contacts[contact_combo.current()]
             
             # Check if already has pad
             if self.manager.has_pad(contact_id):
                 if not messagebox.askyesno(
                     "Pad Exists",
-                    f"{get_contact_name(contact_id, self.contacts)} already has a pad.\n\n"
+                    f"{name_of.get(contact_id, contact_id)} already has a pad.\n\n"
                     "Delete existing pad and generate new one?"
                 ):
                     return
                 self.manager.delete_pad(contact_id)
             
-            # Generate
+            # Generate in the background so the UI stays responsive
             dialog.config(cursor='wait')
-            dialog.update()
+            generate_btn.config(state=tk.DISABLED)
+            cancel_btn.config(state=tk.DISABLED)
+            dialog.protocol("WM_DELETE_WINDOW", lambda: None)
+            progress.configure(maximum=num, value=0)
             
-            success, message = self.manager.generate_pad_for_contact(contact_id, num)
+            def on_progress(done, total):
+                self.master.after(0, lambda v=done: progress.configure(value=v))
             
-            dialog.config(cursor='')
+            def on_done(success, message):
+                dialog.config(cursor='')
+                
+                if success:
+                    progress.configure(value=num)
+                    messagebox.showinfo("Success", message)
+                    dialog.destroy()
+                    self.selected_contact = contact_id
+                    self.schedule_refresh()
+                else:
+                    messagebox.showerror("Error", message)
+                    progress.configure(value=0)
+                    generate_btn.config(state=tk.NORMAL)
+                    cancel_btn.config(state=tk.NORMAL)
+                    dialog.protocol("WM_DELETE_WINDOW", dialog.destroy)
             
-            if success:
-                messagebox.showinfo("Success", message)
-                dialog.destroy()
-                self.selected_contact = contact_id
-                self.refresh_all()
-            else:
-                messagebox.showerror("Error", message)
+            def work():
+                success, message = self.manager.generate_pad_for_contact(
+                    contact_id, num, progress_callback=on_progress
+                )
+                self.master.after(0, lambda: on_done(success, message))
+            
+            threading.Thread(target=work, daemon=True).start()
         
-        tk.Button(
+        generate_btn = ttk.Button(
             btn_frame,
             text="Generate",
             command=do_generate,
-            font=("Helvetica", 11),
-            bg='#238636',
-            fg='white',
-            activebackground='#2ea043',
-            activeforeground='white',
-            relief='flat',
-            padx=20,
-            pady=8,
+            style='Green.TButton',
             cursor='hand2'
-        ).pack(side=tk.LEFT, padx=5)
+        )
+        generate_btn.pack(side=tk.LEFT, padx=5)
         
-        tk.Button(
+        cancel_btn = ttk.Button(
             btn_frame,
             text="Cancel",
             command=dialog.destroy,
-            font=("Helvetica", 11),
-            bg='#21262d',
-            fg='#c9d1d9',
-            activebackground='#30363d',
-            activeforeground='#c9d1d9',
-            relief='flat',
-            padx=20,
-            pady=8,
+            style='Dark.TButton',
             cursor='hand2'
-        ).pack(side=tk.LEFT, padx=5)
+        )
+        cancel_btn.pack(side=tk.LEFT, padx=5)
     
     def generate_pad(self):
         """Generate new pad for selected contact."""
@@ -1104,7 +1179,7 @@ class OTPManagerApp:
         
         removed = self.manager.delete_used_pages(self.selected_contact)
         messagebox.showinfo("Success", f"Removed {removed} used pages.")
-        self.refresh_all()
+        self.schedule_refresh()
     
     def delete_pad(self):
         """Delete the entire pad for selected contact."""
@@ -1123,19 +1198,18 @@ class OTPManagerApp:
         
         self.manager.delete_pad(self.selected_contact)
         self.selected_contact = None
-        self.refresh_all()
+        self.schedule_refresh()
         messagebox.showinfo("Deleted", f"Cipher pad for {name} has been deleted.")
     
     def open_bluetooth(self):
-        """Open Bluetooth sharing app."""
-        import subprocess
-        import sys
-        
-        bt_path = APP_DIR / "otp_bluetooth_share.py"
-        if bt_path.exists():
-            subprocess.Popen([sys.executable, str(bt_path)], cwd=str(APP_DIR))
-        else:
-            messagebox.showerror("Error", "otp_bluetooth_share.py not found!")
+        """Open Bluetooth sharing app (button is disabled if it is missing)."""
+        # Detach so the manager can exit independently of the child
+        subprocess.Popen(
+            [sys.executable, BLUETOOTH_APP],
+            cwd=APP_DIR,
+            close_fds=True,
+            start_new_session=True
+        )
 
 
 # --- MAIN ---
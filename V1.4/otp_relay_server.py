@@ -9,6 +9,10 @@ Compatible with:
 - otp_client.py (legacy shared pad)
 - otp_client_v2.py (per-contact pads)
 
+Clients that log in as "user_id|FRAMED" (otp_client_v2) exchange
+length-prefixed frames instead of raw strings: a 1-byte tag (T = text)
+and a 4-byte big-endian payload length, as in otp_relay_server_voice.py.
+
 Note: The relay server only routes encrypted messages - it never sees plaintext.
 All encryption/decryption happens client-side using their OTP pads.
 
@@ -20,7 +24,10 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import socket
-import socketserver
+import selectors
+import struct
+from collections import deque
+from itertools import islice
 from datetime import datetime
 
 try:
@@ -30,103 +37,338 @@ except ImportError:
     NGROK_AVAILABLE = False
 
 
-# Global client registry: {user_id: socket}
+# Kernel send/receive buffer size for accepted client sockets
+SOCKET_BUFFER_SIZE = 256 * 1024
+
+# Most queued messages handed to one sendmsg() call, well below IOV_MAX
+SENDMSG_BATCH = 256
+
+# Framed stream: 1-byte tag + 4-byte payload length
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_TEXT = ord("T")
+MAX_FRAME_SIZE = 1024 * 1024
+
+# Bytes queued for a recipient before it is disconnected as a slow consumer
+MAX_QUEUED_BYTES = 1024 * 1024
+
+HAS_SENDMSG = hasattr(socket.socket, "sendmsg")  # Not available on Windows
+
+# Global client registry: {user_id: ClientConnection}
+# Only touched from the event loop thread, so no lock is needed.
 clients = {}
-clients_lock = threading.Lock()
 
 
-class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
-    """Handles individual client connections in separate threads."""
+class ClientConnection:
+    """Per-socket state for a client handled by the relay event loop."""
+    
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.user_id = None
+        self.framed = False        # Logged in as "user_id|FRAMED"
+        self.inbuf = bytearray()   # Received bytes of an incomplete frame
+        self.route_prefix = ""     # Precomputed start of the routing log line
+        self.outbox = deque()      # Queued messages not yet accepted by the kernel
+        self.queued_bytes = 0      # Total length of everything in outbox
+        self.writing = False       # Registered for EVENT_WRITE
+
+
+class RelayServer:
+    """
+    Single-threaded TCP relay built on selectors (epoll/kqueue).
+    
+    All client sockets are non-blocking and serviced from one event loop,
+    so there is no per-client thread and no lock around the registry.
+    """
+    
+    poll_interval = 0.5
     
-    def handle(self):
-        client_socket = self.request
-        user_id = None
+    def __init__(self, server_address, gui):
+        self.gui = gui
+        self.selector = selectors.DefaultSelector()
+        
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(server_address)
+        self.listener.listen(128)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
         
+        self._running = False
+        self._is_shut_down = threading.Event()
+        self._pending = set()  # Connections with output queued this tick
+    
+    def serve_forever(self):
+        """Run the event loop until shutdown() is called."""
+        self._running = True
+        self._is_shut_down.clear()
         try:
-            # Receive the userID upon connection
-            user_id = client_socket.recv(1024).decode("utf-8").strip()
-            
-            if not user_id:
-                client_socket.sendall("ERROR|Invalid userID. Connection closed.".encode("utf-8"))
-                return
-            
-            with clients_lock:
-                if user_id in clients:
-                    client_socket.sendall("ERROR|UserID already taken. Connection closed.".encode("utf-8"))
-                    self.server.gui.log_message(f"Rejected '{user_id}' - ID already in use")
-                    return
-                
-                # Register the client
-                clients[user_id] = client_socket
-            
-            client_socket.sendall("OK|Connected successfully.".encode("utf-8"))
-            self.server.gui.log_message(f"User '{user_id}' connected from {self.client_address[0]}")
-            self.server.gui.update_client_count()
-            
-            # Handle incoming messages from this client
-            while True:
-                data = client_socket.recv(8192)
-                if not data:
-                    break
-                
-                message = data.decode("utf-8")
-                self.process_message(message, user_id)
+            while self._running:
+                for key, mask in self.selector.select(self.poll_interval):
+                    if key.data is None:
+                        self.accept()
+                        continue
+                    
+                    # The socket may have been dropped earlier in this batch
+                    conn = key.data
+                    if mask & selectors.EVENT_READ and conn.sock.fileno() != -1:
+                        self.on_readable(conn)
+                    if mask & selectors.EVENT_WRITE and conn.sock.fileno() != -1:
+                        self.flush(conn)
                 
+                # Write everything queued during this tick, one sendmsg() per client
+                pending, self._pending = self._pending, set()
+                for conn in pending:
+                    self.flush(conn)
+        finally:
+            self._is_shut_down.set()
+    
+    def shutdown(self):
+        """Stop the event loop and wait for it to exit."""
+        self._running = False
+        self._is_shut_down.wait()
+    
+    def server_close(self):
+        """Close the listening socket and all client connections."""
+        for conn in list(clients.values()):
+            self.close_connection(conn, notify=False)
+        clients.clear()
+        
+        for key in list(self.selector.get_map().values()):
+            if key.data is not None:
+                self.close_connection(key.data, notify=False)
+        
+        self.selector.unregister(self.listener)
+        self.listener.close()
+        self.selector.close()
+    
+    def accept(self):
+        """Accept a pending connection and register it for reads."""
+        try:
+            sock, address = self.listener.accept()
+        except BlockingIOError:
+            return
+        
+        sock.setblocking(False)
+        # Chat messages are small and latency-bound: disable Nagle so they
+        # go out immediately, and let keepalive detect dead peers
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        conn = ClientConnection(sock, address)
+        self.selector.register(sock, selectors.EVENT_READ, conn)
+    
+    def on_readable(self, conn):
+        """Read from a client and dispatch what arrived."""
+        try:
+            data = conn.sock.recv(8192)
+        except BlockingIOError:
+            return
         except ConnectionResetError:
-            self.server.gui.log_message(f"Connection reset by '{user_id or 'unknown'}'")
+            self.gui.log_message(f"Connection reset by '{conn.user_id or 'unknown'}'")
+            self.close_connection(conn)
+            return
+        except OSError as e:
+            self.gui.log_message(f"Error with '{conn.user_id or 'unknown'}': {e}")
+            self.close_connection(conn)
+            return
+        
+        if not data:
+            self.close_connection(conn)
+            return
+        
+        try:
+            if conn.user_id is None:
+                self.register_user(conn, data)
+            elif conn.framed:
+                self.read_frames(conn, data)
+            else:
+                self.process_message(data, conn)
         except Exception as e:
-            self.server.gui.log_message(f"Error with '{user_id or 'unknown'}': {e}")
-        finally:
-            if user_id:
-                with clients_lock:
-                    if user_id in clients:
-                        del clients[user_id]
-                self.server.gui.log_message(f"User '{user_id}' disconnected")
-                self.server.gui.update_client_count()
+            self.gui.log_message(f"Error with '{conn.user_id or 'unknown'}': {e}")
+            self.close_connection(conn)
     
-    def process_message(self, message, sender_id):
-        """Parse and route a message to its recipient."""
+    def read_frames(self, conn, data):
+        """Buffer data from a framed client and dispatch every complete frame."""
+        inbuf = conn.inbuf
+        inbuf += data
+        start = 0
+        while len(inbuf) - start >= FRAME_HEADER.size:
+            tag, length = FRAME_HEADER.unpack_from(inbuf, start)
+            if length > MAX_FRAME_SIZE:
+                self.gui.log_message(f"Oversized frame from '{conn.user_id}', disconnecting")
+                self.close_connection(conn)
+                return
+            
+            end = start + FRAME_HEADER.size + length
+            if len(inbuf) < end:
+                break
+            if tag == FRAME_TEXT:
+                self.process_message(bytes(inbuf[start + FRAME_HEADER.size:end]), conn)
+                if conn.sock.fileno() == -1:
+                    return  # Dropped while replying (slow consumer)
+            start = end
+        del inbuf[:start]
+    
+    def register_user(self, conn, data):
+        """
+        Handle the userID sent as the first message on a connection.
+        
+        "user_id|FRAMED" opts in to length-prefixed frames.
+        """
+        user_id, _, option = data.decode("utf-8").strip().partition("|")
+        conn.framed = (option == "FRAMED")
+        
+        if not user_id:
+            self.send(conn, "ERROR|Invalid userID. Connection closed.".encode("utf-8"))
+            self.flush(conn)
+            self.close_connection(conn)
+            return
+        
+        if user_id in clients:
+            self.send(conn, "ERROR|UserID already taken. Connection closed.".encode("utf-8"))
+            self.flush(conn)
+            self.gui.log_message(f"Rejected '{user_id}' - ID already in use")
+            self.close_connection(conn)
+            return
+        
+        # Register the client
+        conn.user_id = user_id
+        conn.route_prefix = f"Routing message: '{user_id}' -> "
+        clients[user_id] = conn
+        
+        self.send(conn, "OK|Connected successfully.".encode("utf-8"))
+        self.gui.log_message(f"User '{user_id}' connected from {conn.address[0]}")
+        self.gui.update_client_count()
+    
+    def process_message(self, data, sender):
+        """
+        Parse and route a raw message from the sender's connection.
+        
+        Only the recipient ID is decoded; the payload is forwarded as bytes.
+        """
+        sender_id = sender.user_id
+        
         try:
             # Message format: recipient_id|otp_identifier:encrypted_content
-            recipient_id, payload = message.split("|", 1)
+            recipient_raw, sep, payload = data.partition(b"|")
+            if not sep:
+                raise ValueError
+            recipient_id = recipient_raw.decode("utf-8")
             
-            self.server.gui.log_message(
-                f"Routing message: '{sender_id}' -> '{recipient_id}' ({len(payload)} bytes)"
-            )
+            if self.gui.log_routing:
+                self.gui.log_message(
+                    sender.route_prefix + f"'{recipient_id}' ({len(payload)} bytes)"
+                )
             
-            with clients_lock:
-                recipient_socket = clients.get(recipient_id)
-                sender_socket = clients.get(sender_id)
+            recipient = clients.get(recipient_id)
             
-            if recipient_socket:
-                try:
-                    # Forward message with sender info: sender_id|payload
-                    full_message = f"{sender_id}|{payload}"
-                    recipient_socket.sendall(full_message.encode("utf-8"))
-                except Exception as e:
-                    self.server.gui.log_message(f"Failed to deliver to '{recipient_id}': {e}")
-                    with clients_lock:
-                        if recipient_id in clients:
-                            del clients[recipient_id]
+            if recipient:
+                # Forward message with sender info: sender_id|payload
+                full_message = f"{sender_id}|".encode("utf-8") + payload
+                self.send(recipient, full_message)
             else:
-                # Notify sender that recipient is offline
-                if sender_socket:
-                    error_msg = f"SYSTEM|offline:{recipient_id} is not online."
-                    sender_socket.sendall(error_msg.encode("utf-8"))
-                self.server.gui.log_message(f"Recipient '{recipient_id}' not found")
+                self.gui.log_message(f"Recipient '{recipient_id}' not found")
+            
+            if recipient_id not in clients:
+                # Notify sender that recipient is offline (or was just dropped)
+                error_msg = f"SYSTEM|offline:{recipient_id} is not online."
+                self.send(sender, error_msg.encode("utf-8"))
                 
         except ValueError:
-            self.server.gui.log_message(f"Malformed message from '{sender_id}'")
-
-
-class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
-    """Multi-threaded TCP server."""
-    daemon_threads = True
-    allow_reuse_address = True
+            self.gui.log_message(f"Malformed message from '{sender_id}'")
     
-    def __init__(self, server_address, RequestHandlerClass, gui):
-        super().__init__(server_address, RequestHandlerClass)
-        self.gui = gui
+    def send(self, conn, data):
+        """
+        Queue a message for a client.
+        
+        Queued messages are written at the end of the current event loop tick.
+        Messages to framed clients are framed here; raw clients have nothing
+        marking where a message ends, so flush() never joins theirs.
+        Returns False if the client has fallen more than MAX_QUEUED_BYTES
+        behind and was disconnected instead.
+        """
+        if conn.framed:
+            data = FRAME_HEADER.pack(FRAME_TEXT, len(data)) + data
+        
+        if conn.queued_bytes + len(data) > MAX_QUEUED_BYTES:
+            self.gui.log_message(f"Slow consumer dropped: '{conn.user_id or 'unknown'}'")
+            self.close_connection(conn)
+            return False
+        
+        conn.outbox.append(data)
+        conn.queued_bytes += len(data)
+        self._pending.add(conn)
+        return True
+    
+    def flush(self, conn):
+        """Write queued output, waiting for EVENT_WRITE if it would block."""
+        if conn.sock.fileno() == -1:
+            return False
+        
+        try:
+            while conn.outbox:
+                if not conn.framed:
+                    # One message per send() so the client's recv() sees it alone
+                    sent = conn.sock.send(conn.outbox[0])
+                elif HAS_SENDMSG:
+                    sent = conn.sock.sendmsg(islice(conn.outbox, SENDMSG_BATCH))
+                else:
+                    sent = conn.sock.send(b"".join(islice(conn.outbox, SENDMSG_BATCH)))
+                self._consume(conn, sent)
+        except BlockingIOError:
+            pass
+        except OSError as e:
+            self.gui.log_message(f"Failed to send to '{conn.user_id or 'unknown'}': {e}")
+            self.close_connection(conn)
+            return False
+        
+        writing = bool(conn.outbox)
+        if writing != conn.writing:
+            events = selectors.EVENT_READ
+            if writing:
+                events |= selectors.EVENT_WRITE
+            self.selector.modify(conn.sock, events, conn)
+            conn.writing = writing
+        return True
+    
+    @staticmethod
+    def _consume(conn, sent):
+        """Drop the first `sent` bytes from a connection's queued output."""
+        outbox = conn.outbox
+        conn.queued_bytes -= sent
+        while sent:
+            head = outbox[0]
+            if sent >= len(head):
+                sent -= len(head)
+                outbox.popleft()
+            else:
+                outbox[0] = memoryview(head)[sent:]
+                sent = 0
+    
+    def close_connection(self, conn, notify=True):
+        """Unregister and close a client socket, dropping it from the registry."""
+        if conn.sock.fileno() == -1:
+            return
+        
+        try:
+            self.selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+        
+        conn.outbox.clear()
+        conn.queued_bytes = 0
+        
+        if conn.user_id and clients.get(conn.user_id) is conn:
+            del clients[conn.user_id]
+            if notify:
+                self.gui.log_message(f"User '{conn.user_id}' disconnected")
+                self.gui.update_client_count()
 
 
 class RelayServerGUI:
@@ -145,7 +387,15 @@ class RelayServerGUI:
         self.server_thread = None
         self.ngrok_tunnel = None
         
+        # Per-message routing log lines are skipped when this is False.
+        # Kept as a plain attribute so the event loop thread never calls into Tk.
+        self.log_routing = True
+        self.iconified = False
+        
         self.setup_ui()
+        
+        self.master.bind("<Unmap>", self.on_visibility_change)
+        self.master.bind("<Map>", self.on_visibility_change)
     
     def setup_ui(self):
         """Build the user interface."""
@@ -215,10 +465,26 @@ class RelayServerGUI:
         )
         self.log_area.pack(fill=tk.BOTH, expand=True)
         
+        self.verbose = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            log_frame, text="Log routed messages", variable=self.verbose,
+            command=self.update_log_routing
+        ).pack(anchor=tk.W, pady=(5, 0))
+        
         # Check ngrok availability
         if not NGROK_AVAILABLE:
             self.log_message("Warning: pyngrok not installed. Install with: pip install pyngrok")
     
+    def update_log_routing(self):
+        """Only log routed messages when enabled and the window is visible."""
+        self.log_routing = self.verbose.get() and not self.iconified
+    
+    def on_visibility_change(self, event):
+        """Track whether the main window is minimized."""
+        if event.widget is self.master:
+            self.iconified = self.master.state() == "iconic"
+            self.update_log_routing()
+    
     def log_message(self, message):
         """Add a timestamped message to the log."""
         timestamp = datetime.now().strftime("%H:%M:%S")
@@ -234,9 +500,7 @@ class RelayServerGUI:
     def update_client_count(self):
         """Update the connected clients counter."""
         def update():
-            with clients_lock:
-                count = len(clients)
-            self.client_count_label.config(text=f"Clients: {count}")
+            self.client_count_label.config(text=f"Clients: {len(clients)}")
         
         self.master.after(0, update)
     
@@ -273,9 +537,7 @@ class RelayServerGUI:
             
             # Start the TCP server
             def run_server():
-                self.server = ThreadedTCPServer(
-                    (self.HOST, self.PORT), ThreadedTCPRequestHandler, self
-                )
+                self.server = RelayServer((self.HOST, self.PORT), self)
                 self.log_message(f"Server listening on {self.HOST}:{self.PORT}")
                 self.server.serve_forever()
             
@@ -296,16 +558,7 @@ class RelayServerGUI:
         """Stop the relay server and ngrok tunnel."""
         self.log_message("Stopping server...")
         
-        # Disconnect all clients
-        with clients_lock:
-            for user_id, sock in list(clients.items()):
-                try:
-                    sock.close()
-                except:
-                    pass
-            clients.clear()
-        
-        # Stop the server
+        # Stop the server (this also disconnects all clients)
         if self.server:
             try:
                 self.server.shutdown()
@@ -4,10 +4,16 @@ Routes encrypted messages AND voice calls between connected clients.
 Supports one-on-one messaging, one-on-one calls, and group voice calls.
 
 New Protocol Types:
-- VOICE: Voice audio data routing
+- VOICE: Voice audio data routing (TCP text or binary UDP datagrams)
+- UDP: Registers a client's UDP address for voice datagrams
 - ROOM: Voice room management (create, join, leave, invite)
 - SIGNAL: Call signaling
 
+Clients that log in as "user_id|FRAMED" (the voice client and
+otp_client_v2) exchange length-prefixed frames instead of raw strings:
+a 1-byte tag (T = text, V = binary voice) and a 4-byte big-endian
+payload length.
+
 Works with:
 - OTP Client (text messaging)
 - OTP Voice Client (voice calls)
@@ -19,8 +25,10 @@ from tkinter import ttk, messagebox, scrolledtext
 import threading
 import socket
 import socketserver
+import struct
+from binascii import a2b_base64, b2a_base64
 from datetime import datetime
-from collections import defaultdict
+from collections import defaultdict, deque
 
 try:
     from pyngrok import ngrok
@@ -29,10 +37,35 @@ except ImportError:
     NGROK_AVAILABLE = False
 
 
-# Global client registry: {user_id: socket}
+# Kernel send/receive buffer size for accepted client sockets
+SOCKET_BUFFER_SIZE = 256 * 1024
+
+# Voice frame layout: header + room_id + sender + ciphertext
+# (UDP datagrams prefix it with b"V")
+VOICE_HEADER = struct.Struct("!BBH")  # room_id length, sender length, ciphertext length
+
+# Framed TCP stream: tag + payload length, then the payload
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_TEXT = ord("T")
+FRAME_VOICE = ord("V")
+MAX_FRAME_SIZE = 1024 * 1024
+STREAM_BUFFER_SIZE = 65536  # Per-client receive buffer shared by all frames that fit
+MAX_DATAGRAM_SEND = 1472  # Ethernet MTU minus IP/UDP headers; larger frames go over TCP
+VOICE_QUEUE_FRAMES = 8  # Voice queued per TCP client before the oldest is dropped (~160 ms)
+
+# Packet priority for voice sockets: Linux queueing priority and DSCP EF
+VOICE_SO_PRIORITY = 6
+VOICE_TOS = 0xB8
+
+# Global client registry: {user_id: ClientConnection}
 clients = {}
 clients_lock = threading.Lock()
 
+# UDP voice registrations, guarded by clients_lock
+udp_tokens = {}  # {token: user_id} announced over TCP
+udp_addrs = {}   # {user_id: (host, port)}
+udp_users = {}   # {(host, port): user_id}
+
 # Voice rooms registry: {room_id: VoiceRoomInfo}
 voice_rooms = {}
 rooms_lock = threading.Lock()
@@ -59,42 +92,290 @@ class VoiceRoomInfo:
         return ",".join(sorted(self.participants))
 
 
+class ClientConnection:
+    """A client's TCP socket and the framing it speaks."""
+    
+    def __init__(self, sock, framed: bool = False):
+        self.sock = sock
+        self.framed = framed
+        # Handler threads and the voice sender all send to the same socket;
+        # interleaved partial sends would corrupt the framing
+        self.send_lock = threading.Lock()
+        
+        # Voice goes out on its own thread so a client that stops reading
+        # never blocks the relaying thread (the UDP server has only one)
+        self.voice_queue = deque(maxlen=VOICE_QUEUE_FRAMES)
+        self.voice_ready = threading.Condition()
+        self.voice_thread = None
+        self.closed = False
+    
+    def send_text(self, message: str):
+        """Send a protocol string, framed if the client asked for it."""
+        data = message.encode("utf-8")
+        if self.framed:
+            self.send_frame(FRAME_TEXT, data)
+        else:
+            with self.send_lock:
+                self.sock.sendall(data)
+    
+    def send_frame(self, tag: int, payload: bytes):
+        """Send one length-prefixed frame."""
+        with self.send_lock:
+            self.sock.sendall(FRAME_HEADER.pack(tag, len(payload)) + payload)
+    
+    def queue_voice(self, data: bytes):
+        """
+        Queue encoded voice for the sender thread without blocking.
+        
+        When the client is not keeping up, the oldest queued frame is
+        dropped: late audio is useless anyway.
+        """
+        with self.voice_ready:
+            if self.closed:
+                return
+            self.voice_queue.append(data)
+            if self.voice_thread is None:
+                self.voice_thread = threading.Thread(target=self.send_voice_loop, daemon=True)
+                self.voice_thread.start()
+            self.voice_ready.notify()
+    
+    def send_voice_loop(self):
+        """Sender thread: write queued voice until the connection closes."""
+        while True:
+            with self.voice_ready:
+                while not self.voice_queue and not self.closed:
+                    self.voice_ready.wait()
+                if self.closed:
+                    return
+                data = self.voice_queue.popleft()
+            
+            try:
+                with self.send_lock:
+                    self.sock.sendall(data)
+            except OSError:
+                return  # The handler thread notices the disconnect
+    
+    def stop_voice(self):
+        """Stop the voice sender thread and discard queued voice."""
+        with self.voice_ready:
+            self.closed = True
+            self.voice_queue.clear()
+            self.voice_ready.notify()
+    
+    def close(self):
+        self.stop_voice()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class FrameReader:
+    """
+    Buffered reader for a client's framed TCP stream.
+    
+    Each recv_into() takes whatever the kernel has ready, so a burst of
+    small voice frames costs one syscall rather than two per frame.
+    Payloads are memoryviews into the buffer and are only valid until
+    the next read_frame() call.
+    """
+    
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = bytearray(STREAM_BUFFER_SIZE)
+        self.view = memoryview(self.buf)
+        self.start = 0  # First unparsed byte
+        self.end = 0    # End of received data
+    
+    def read_frame(self):
+        """Read one (tag, payload) frame, or return None on disconnect."""
+        if self.start == self.end:
+            self.start = self.end = 0
+        
+        if not self.fill(FRAME_HEADER.size):
+            return None
+        tag, length = FRAME_HEADER.unpack_from(self.buf, self.start)
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"frame of {length} bytes exceeds limit")
+        
+        if not self.fill(FRAME_HEADER.size + length):
+            return None
+        payload_start = self.start + FRAME_HEADER.size
+        self.start = payload_start + length
+        return tag, self.view[payload_start:self.start]
+    
+    def fill(self, size: int) -> bool:
+        """Buffer at least size unparsed bytes; False if the peer closed first."""
+        while self.end - self.start < size:
+            if self.start + size > len(self.buf):
+                # Move the partial frame to the front, growing for large frames
+                pending = self.end - self.start
+                if size > len(self.buf):
+                    buf = bytearray(size)
+                    buf[:pending] = self.view[self.start:self.end]
+                    self.buf, self.view = buf, memoryview(buf)
+                else:
+                    self.buf[:pending] = bytes(self.view[self.start:self.end])
+                self.start, self.end = 0, pending
+            
+            count = self.sock.recv_into(self.view[self.end:])
+            if not count:
+                return False
+            self.end += count
+        return True
+
+
+def unpack_voice_frame(data, offset: int = 0):
+    """Split a voice frame into (room_id, sender, ciphertext), or None if malformed."""
+    if len(data) - offset < VOICE_HEADER.size:
+        return None
+    
+    room_len, sender_len, ct_len = VOICE_HEADER.unpack_from(data, offset)
+    room_start = offset + VOICE_HEADER.size
+    room_end = room_start + room_len
+    sender_end = room_end + sender_len
+    if len(data) != sender_end + ct_len:
+        return None
+    
+    room_id = bytes(data[room_start:room_end]).decode("utf-8", "replace")
+    sender = bytes(data[room_end:sender_end]).decode("utf-8", "replace")
+    return room_id, sender, bytes(data[sender_end:])
+
+
+def mark_voice_socket(sock):
+    """Ask the network stack to queue this socket's packets as voice (best effort)."""
+    for level, name, value in (
+        (socket.SOL_SOCKET, "SO_PRIORITY", VOICE_SO_PRIORITY),
+        (socket.IPPROTO_IP, "IP_TOS", VOICE_TOS),
+    ):
+        option = getattr(socket, name, None)
+        if option is None:
+            continue
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            pass  # Not permitted on every platform
+
+
+def forget_udp_address(user_id: str):
+    """Drop a user's UDP voice registration. Caller must hold clients_lock."""
+    addr = udp_addrs.pop(user_id, None)
+    if addr is not None:
+        udp_users.pop(addr, None)
+    for token in [t for t, owner in udp_tokens.items() if owner == user_id]:
+        del udp_tokens[token]
+
+
+def relay_voice_frame(voice_socket, room_id: str, sender_id: str, encrypted: bytes, gui):
+    """
+    Forward an encrypted voice frame to every other participant in a room.
+    
+    Participants with a registered UDP address get a binary datagram
+    when it fits in one packet, framed TCP clients a binary voice frame,
+    and the rest the TCP text form (VOICE|room_id|sender|base64).
+    
+    TCP deliveries are only queued (see ClientConnection.queue_voice), so
+    a stalled participant cannot hold up this thread or anyone else's audio.
+    """
+    with rooms_lock:
+        room = voice_rooms.get(room_id)
+        if not room or sender_id not in room.participants:
+            return
+        participants = [p for p in room.participants if p != sender_id]
+    
+    room_bytes = room_id.encode("utf-8")
+    sender_bytes = sender_id.encode("utf-8")
+    voice_frame = (
+        VOICE_HEADER.pack(len(room_bytes), len(sender_bytes), len(encrypted))
+        + room_bytes + sender_bytes + encrypted
+    )
+    datagram = None
+    tcp_frame = None
+    legacy_message = None
+    
+    for participant in participants:
+        with clients_lock:
+            addr = udp_addrs.get(participant)
+            conn = clients.get(participant)
+        
+        try:
+            if addr and voice_socket and len(voice_frame) < MAX_DATAGRAM_SEND:
+                if datagram is None:
+                    datagram = b"V" + voice_frame
+                voice_socket.sendto(datagram, addr)
+            elif conn and conn.framed:
+                if tcp_frame is None:
+                    tcp_frame = FRAME_HEADER.pack(FRAME_VOICE, len(voice_frame)) + voice_frame
+                conn.queue_voice(tcp_frame)
+            elif conn:
+                if legacy_message is None:
+                    encoded = b2a_base64(encrypted, newline=False).decode("ascii")
+                    legacy_message = f"VOICE|{room_id}|{sender_id}|{encoded}".encode("utf-8")
+                conn.queue_voice(legacy_message)
+        except Exception as e:
+            gui.log_message(f"Failed to send voice to '{participant}': {e}")
+
+
 class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
     """Handles individual client connections in separate threads."""
     
+    def setup(self):
+        # Voice and chat traffic is latency-bound: disable Nagle so small
+        # packets go out immediately, and let keepalive detect dead peers
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+        mark_voice_socket(sock)
+        
+        # Protocol messages by type; anything else is an OTP text message
+        self.message_handlers = {
+            "VOICE": self.handle_voice_message,
+            "ROOM": self.handle_room_command,
+            "SIGNAL": self.handle_signal_message,
+            "UDP": self.register_udp_token,
+        }
+    
     def handle(self):
         client_socket = self.request
         user_id = None
         
         try:
-            # Receive the userID upon connection
-            user_id = client_socket.recv(1024).decode("utf-8").strip()
+            # Receive the userID upon connection ("user_id|FRAMED" opts in to framing)
+            hello = client_socket.recv(1024).decode("utf-8").strip()
+            name, _, option = hello.partition("|")
+            conn = ClientConnection(client_socket, framed=(option == "FRAMED"))
             
-            if not user_id:
-                client_socket.sendall("ERROR|Invalid userID. Connection closed.".encode("utf-8"))
+            if not name:
+                conn.send_text("ERROR|Invalid userID. Connection closed.")
                 return
             
             with clients_lock:
-                if user_id in clients:
-                    client_socket.sendall("ERROR|UserID already taken. Connection closed.".encode("utf-8"))
-                    self.server.gui.log_message(f"Rejected '{user_id}' - ID already in use")
+                if name in clients:
+                    conn.send_text("ERROR|UserID already taken. Connection closed.")
+                    self.server.gui.log_message(f"Rejected '{name}' - ID already in use")
                     return
                 
                 # Register the client
-                clients[user_id] = client_socket
+                user_id = name
+                clients[user_id] = conn
             
-            client_socket.sendall("OK|Connected successfully.".encode("utf-8"))
+            conn.send_text("OK|Connected successfully.")
             self.server.gui.log_message(f"User '{user_id}' connected from {self.client_address[0]}")
             self.server.gui.update_client_count()
             
             # Handle incoming messages from this client
-            while True:
-                data = client_socket.recv(65536)  # Larger buffer for voice data
-                if not data:
-                    break
-                
-                message = data.decode("utf-8")
-                self.process_message(message, user_id)
+            if conn.framed:
+                self.read_frames(client_socket, user_id)
+            else:
+                while True:
+                    data = client_socket.recv(65536)  # Larger buffer for voice data
+                    if not data:
+                        break
+                    
+                    message = data.decode("utf-8")
+                    self.process_message(message, user_id)
                 
         except ConnectionResetError:
             self.server.gui.log_message(f"Connection reset by '{user_id or 'unknown'}'")
@@ -102,16 +383,46 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             self.server.gui.log_message(f"Error with '{user_id or 'unknown'}': {e}")
         finally:
             if user_id:
+                conn.stop_voice()
+                
                 # Clean up user from any voice rooms
                 self.cleanup_user_from_rooms(user_id)
                 
                 with clients_lock:
                     if user_id in clients:
                         del clients[user_id]
+                    forget_udp_address(user_id)
                 self.server.gui.log_message(f"User '{user_id}' disconnected")
                 self.server.gui.update_client_count()
                 self.server.gui.update_room_count()
     
+    def read_frames(self, client_socket, user_id: str):
+        """Read length-prefixed frames until the client disconnects."""
+        reader = FrameReader(client_socket)
+        while True:
+            try:
+                frame = reader.read_frame()
+            except ValueError:
+                self.server.gui.log_message(f"Oversized frame from '{user_id}', disconnecting")
+                return
+            if frame is None:
+                return
+            
+            tag, payload = frame
+            if tag == FRAME_VOICE:
+                self.handle_voice_frame(payload, user_id)
+            elif tag == FRAME_TEXT:
+                self.process_message(str(payload, "utf-8"), user_id)
+    
+    def handle_voice_frame(self, payload: bytes, sender_id: str):
+        """Route a binary voice frame received over TCP."""
+        frame = unpack_voice_frame(payload)
+        if frame is None:
+            return
+        
+        room_id, _, encrypted = frame
+        relay_voice_frame(self.server.voice_socket, room_id, sender_id, encrypted, self.server.gui)
+    
     def cleanup_user_from_rooms(self, user_id: str):
         """Remove user from all voice rooms they're in."""
         rooms_to_delete = []
@@ -136,25 +447,11 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
         try:
             parts = message.split("|", 3)
             
-            if not parts:
-                return
-            
-            msg_type = parts[0]
-            
-            # Voice data routing
-            if msg_type == "VOICE":
-                self.handle_voice_message(parts, sender_id)
-            
-            # Room management
-            elif msg_type == "ROOM":
-                self.handle_room_command(parts, sender_id)
-            
-            # Signaling
-            elif msg_type == "SIGNAL":
-                self.handle_signal_message(parts, sender_id)
-            
-            # Standard OTP text message routing
+            handler = self.message_handlers.get(parts[0])
+            if handler:
+                handler(parts, sender_id)
             else:
+                # Standard OTP text message routing
                 self.route_text_message(message, sender_id)
                 
         except Exception as e:
@@ -167,16 +464,19 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
             return
         
         room_id = parts[1]
-        encoded_audio = parts[3]
+        encrypted = a2b_base64(parts[3])
         
-        with rooms_lock:
-            room = voice_rooms.get(room_id)
-            if not room or sender_id not in room.participants:
-                return
+        relay_voice_frame(self.server.voice_socket, room_id, sender_id, encrypted, self.server.gui)
+    
+    def register_udp_token(self, parts: list, sender_id: str):
+        """Remember the token a client will present in its UDP hello."""
+        # Format: UDP|token
+        if len(parts) < 2 or not parts[1]:
+            return
         
-        # Broadcast to all other participants
-        voice_msg = f"VOICE|{room_id}|{sender_id}|{encoded_audio}"
-        self.broadcast_to_room(room_id, voice_msg, exclude=sender_id)
+        with clients_lock:
+            forget_udp_address(sender_id)
+            udp_tokens[parts[1]] = sender_id
     
     def handle_room_command(self, parts: list, sender_id: str):
         """Handle room management commands."""
@@ -318,21 +618,22 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
         """Route a standard text message to its recipient."""
         try:
             # Message format: recipient_id|otp_identifier:encrypted_content
-            recipient_id, payload = message.split("|", 1)
+            recipient_id, sep, payload = message.partition("|")
+            if not sep:
+                raise ValueError
             
             self.server.gui.log_message(
                 f"Routing message: '{sender_id}' -> '{recipient_id}' ({len(payload)} bytes)"
             )
             
             with clients_lock:
-                recipient_socket = clients.get(recipient_id)
-                sender_socket = clients.get(sender_id)
+                recipient_conn = clients.get(recipient_id)
+                sender_conn = clients.get(sender_id)
             
-            if recipient_socket:
+            if recipient_conn:
                 try:
                     # Forward message with sender info: sender_id|payload
-                    full_message = f"{sender_id}|{payload}"
-                    recipient_socket.sendall(full_message.encode("utf-8"))
+                    recipient_conn.send_text(f"{sender_id}|{payload}")
                 except Exception as e:
                     self.server.gui.log_message(f"Failed to deliver to '{recipient_id}': {e}")
                     with clients_lock:
@@ -340,9 +641,8 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
                             del clients[recipient_id]
             else:
                 # Notify sender that recipient is offline
-                if sender_socket:
-                    error_msg = f"SYSTEM|offline:{recipient_id} is not online."
-                    sender_socket.sendall(error_msg.encode("utf-8"))
+                if sender_conn:
+                    sender_conn.send_text(f"SYSTEM|offline:{recipient_id} is not online.")
                 self.server.gui.log_message(f"Recipient '{recipient_id}' not found")
                 
         except ValueError:
@@ -363,17 +663,65 @@ class ThreadedTCPRequestHandler(socketserver.BaseRequestHandler):
     def send_to_user(self, user_id: str, message: str) -> bool:
         """Send a message to a specific user."""
         with clients_lock:
-            socket = clients.get(user_id)
+            conn = clients.get(user_id)
         
-        if socket:
+        if conn:
             try:
-                socket.sendall(message.encode("utf-8"))
+                conn.send_text(message)
                 return True
             except Exception as e:
                 self.server.gui.log_message(f"Failed to send to '{user_id}': {e}")
         return False
 
 
+class VoiceDatagramHandler(socketserver.BaseRequestHandler):
+    """Handles UDP hello and voice datagrams."""
+    
+    def handle(self):
+        data, sock = self.request
+        kind = data[:1]
+        
+        if kind == b"V":
+            self.handle_voice_datagram(data, sock)
+        elif kind == b"H":
+            self.handle_hello(data[1:].decode("utf-8", "replace"), sock)
+    
+    def handle_hello(self, token: str, sock):
+        """Bind the sender's UDP address to the user that announced the token."""
+        with clients_lock:
+            user_id = udp_tokens.get(token)
+            if user_id is None or user_id not in clients:
+                return
+            
+            if udp_addrs.get(user_id) != self.client_address:
+                forget_udp_address(user_id)
+                udp_tokens[token] = user_id
+                udp_addrs[user_id] = self.client_address
+                udp_users[self.client_address] = user_id
+                self.server.gui.log_message(
+                    f"User '{user_id}' registered UDP voice from {self.client_address[0]}"
+                )
+        
+        sock.sendto(b"A", self.client_address)
+    
+    def handle_voice_datagram(self, data: bytes, sock):
+        """Route a binary voice frame to room participants."""
+        frame = unpack_voice_frame(data, 1)
+        if frame is None:
+            return
+        
+        room_id, sender, encrypted = frame
+        
+        with clients_lock:
+            sender_id = udp_users.get(self.client_address)
+        
+        # Only accept frames from the address the sender registered
+        if sender_id is None or sender != sender_id:
+            return
+        
+        relay_voice_frame(sock, room_id, sender_id, encrypted, self.server.gui)
+
+
 class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     """Multi-threaded TCP server."""
     daemon_threads = True
@@ -382,6 +730,18 @@ class ThreadedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
     def __init__(self, server_address, RequestHandlerClass, gui):
         super().__init__(server_address, RequestHandlerClass)
         self.gui = gui
+        self.voice_socket = None  # UDP socket used to forward voice datagrams
+
+
+class VoiceDatagramServer(socketserver.UDPServer):
+    """Single-threaded UDP server for voice datagrams."""
+    allow_reuse_address = True
+    max_packet_size = 65535
+    
+    def __init__(self, server_address, RequestHandlerClass, gui):
+        super().__init__(server_address, RequestHandlerClass)
+        self.gui = gui
+        mark_voice_socket(self.socket)
 
 
 class RelayServerGUI:
@@ -398,6 +758,8 @@ class RelayServerGUI:
         
         self.server = None
         self.server_thread = None
+        self.voice_server = None
+        self.voice_thread = None
         self.ngrok_tunnel = None
         
         self.setup_ui()
@@ -573,12 +935,22 @@ class RelayServerGUI:
                 self.ngrok_label.config(text="Ngrok: Unavailable (local only)", foreground="orange")
                 self.connection_info.config(text=f"Local: {self.HOST}:{self.PORT}")
             
+            # Voice datagrams share the port number on UDP; clients that cannot
+            # reach it (e.g. through a TCP-only ngrok tunnel) fall back to TCP
+            self.voice_server = VoiceDatagramServer(
+                (self.HOST, self.PORT), VoiceDatagramHandler, self
+            )
+            self.voice_thread = threading.Thread(target=self.voice_server.serve_forever, daemon=True)
+            self.voice_thread.start()
+            
             # Start the TCP server
             def run_server():
                 self.server = ThreadedTCPServer(
                     (self.HOST, self.PORT), ThreadedTCPRequestHandler, self
                 )
+                self.server.voice_socket = self.voice_server.socket
                 self.log_message(f"Server listening on {self.HOST}:{self.PORT}")
+                self.log_message(f"Voice datagrams on UDP port {self.PORT}")
                 self.log_message("Voice rooms and text messaging enabled")
                 self.server.serve_forever()
             
@@ -601,12 +973,12 @@ class RelayServerGUI:
         
         # Disconnect all clients
         with clients_lock:
-            for user_id, sock in list(clients.items()):
-                try:
-                    sock.close()
-                except:
-                    pass
+            for conn in list(clients.values()):
+                conn.close()
             clients.clear()
+            udp_tokens.clear()
+            udp_addrs.clear()
+            udp_users.clear()
         
         # Clear all rooms
         with rooms_lock:
@@ -620,6 +992,13 @@ class RelayServerGUI:
             except Exception as e:
                 self.log_message(f"Error stopping server: {e}")
         
+        if self.voice_server:
+            try:
+                self.voice_server.shutdown()
+                self.voice_server.server_close()
+            except Exception as e:
+                self.log_message(f"Error stopping voice server: {e}")
+        
         # Disconnect ngrok
         if self.ngrok_tunnel and NGROK_AVAILABLE:
             try:
@@ -631,6 +1010,8 @@ class RelayServerGUI:
         # Reset state
         self.server = None
         self.server_thread = None
+        self.voice_server = None
+        self.voice_thread = None
         self.ngrok_tunnel = None
         
         # Update UI
@@ -12,6 +12,8 @@ Features:
 
 Requirements:
     pip install pyaudio cryptography
+    pip install numpy  (optional, faster audio level metering and mixing)
+    pip install audioop-lts  (Python 3.13+ only, enables mu-law compression)
 
 Usage:
     python3 otp_voice_client.py
@@ -20,15 +22,20 @@ Usage:
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 import socket
+import sys
 import threading
+import queue
 import struct
 import time
 import os
 import hashlib
 import base64
+import functools
+import warnings
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict
+from array import array
+from collections import defaultdict, deque
 
 # Audio handling
 try:
@@ -41,13 +48,33 @@ except ImportError:
 # Encryption
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    AEAD_INTO_AVAILABLE = hasattr(AESGCM, "encrypt_into")  # cryptography >= 45
     from cryptography.hazmat.primitives import hashes
     from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
     CRYPTO_AVAILABLE = True
 except ImportError:
     CRYPTO_AVAILABLE = False
+    AEAD_INTO_AVAILABLE = False
     print("Warning: cryptography not installed. Install with: pip install cryptography")
 
+# Vectorized audio math (optional)
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+# G.711 mu-law encoder (optional; audioop left the stdlib in Python 3.13,
+# pip install audioop-lts brings it back). Decoding never needs it.
+try:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        import audioop
+    ULAW_AVAILABLE = True
+except ImportError:
+    ULAW_AVAILABLE = False
+
 
 # --- CONFIGURATION ---
 CREDENTIALS_FILE = "credentials.txt"
@@ -58,11 +85,50 @@ FORMAT = pyaudio.paInt16 if AUDIO_AVAILABLE else None
 CHANNELS = 1               # Mono audio
 RATE = 16000               # 16kHz sample rate (good for voice)
 AUDIO_PACKET_INTERVAL = 0.05  # 50ms packets
+CAPTURE_QUEUE_FRAMES = 8   # Captured frames buffered ahead of the send worker
+PLAYBACK_QUEUE_FRAMES = 8  # Frames buffered per remote speaker before dropping
+TX_QUEUE_FRAMES = 8        # Encrypted frames waiting for the sender thread
+LEVEL_METER_INTERVAL = 1 / 15  # Seconds between level meter redraws
+LOG_FLUSH_DELAY_MS = 50    # Log lines arriving within this window share one redraw
+
+# First plaintext byte of every voice frame names its encoding
+CODEC_PCM16 = b"\x00"      # Raw 16-bit PCM
+CODEC_ULAW = b"\x01"       # 8-bit G.711 mu-law (half the bytes to encrypt and send)
 
 # Protocol identifiers
-PROTO_VOICE = "VOICE"
 PROTO_ROOM = "ROOM"
 PROTO_SIGNAL = "SIGNAL"
+PROTO_UDP = "UDP"
+
+# Voice frames: header + room_id + sender + ciphertext (UDP datagrams
+# prefix it with b"V", TCP sends it as a FRAME_VOICE payload)
+VOICE_HEADER = struct.Struct("!BBH")  # room_id length, sender length, ciphertext length
+MAX_NAME_BYTES = 255                  # Longest room_id/username a voice frame can carry
+
+# The TCP stream is framed: tag + payload length, then the payload
+FRAME_HEADER = struct.Struct("!BI")
+FRAME_TEXT = ord("T")      # UTF-8 protocol string (ROOM|..., SYSTEM|..., ...)
+FRAME_VOICE = ord("V")     # Binary voice frame
+MAX_FRAME_SIZE = 1024 * 1024
+DATAGRAM_SIZE = 65535      # Receive buffer, reused for every datagram
+MAX_DATAGRAM_SEND = 1472   # Ethernet MTU minus IP/UDP headers; larger frames go over TCP
+STREAM_BUFFER_SIZE = 65536 # TCP receive buffer shared by all frames that fit
+
+# Kernel send/receive buffers for the server connection, enough to ride out
+# receive-thread stalls. Linux caps these at net.core.rmem_max / wmem_max,
+# so raise those sysctls to get the full size.
+SOCKET_BUFFER_SIZE = 4 * 1024 * 1024
+UDP_HELLO_ATTEMPTS = 5     # Hellos sent before settling for TCP voice
+UDP_HELLO_INTERVAL = 1.0   # Seconds between hellos
+VOICE_SO_PRIORITY = 6      # Linux queueing priority for voice sockets
+VOICE_TOS = 0xB8           # DSCP EF (expedited forwarding)
+
+# UDP generic segmentation offload: several equal-size voice datagrams
+# leave in one sendmsg() and the kernel splits them (Linux only)
+GSO_AVAILABLE = sys.platform.startswith("linux")
+UDP_SEGMENT = getattr(socket, "UDP_SEGMENT", 103)
+VOICE_BATCH_FRAMES = 4     # Datagrams per sendmsg() at most
+VOICE_BATCH_DELAY = 0.1    # Seconds the oldest batched frame may wait
 
 # Room commands
 CMD_CREATE = "CREATE"
@@ -75,31 +141,75 @@ CMD_KICK = "KICK"
 
 # --- ENCRYPTION ---
 
+# GCM nonce: random per-cipher prefix + 32-bit frame counter
+NONCE = struct.Struct("!8sI")
+NONCE_SIZE = NONCE.size
+TAG_SIZE = 16
+NONCE_COUNTER_LIMIT = 0xFFFFFFFF
+PBKDF2_ITERATIONS = 100000  # Balance security and speed
+VOICE_STREAM_INFO = b"otp-voice stream|"  # HKDF info prefix, followed by the sender
+
+
+@functools.lru_cache(maxsize=64)
+def _derive_key(password: bytes, salt: bytes) -> bytes:
+    """
+    Derive a 256-bit room key with PBKDF2-HMAC-SHA256.
+    
+    The KDF is deterministic, so results are cached: rejoining a room or
+    re-applying the same salt skips the 100k iterations.
+    """
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=PBKDF2_ITERATIONS,
+    )
+    return kdf.derive(password)
+
 class AESCipher:
     """
     AES-256-GCM encryption for voice data.
     Provides authenticated encryption with associated data.
     """
     
-    def __init__(self, password: str, salt: bytes = None):
+    def __init__(self, password: str = None, salt: bytes = None, key: bytes = None):
         """
         Initialize cipher with a password-derived key.
         
         Args:
             password: Shared secret for the call/room
             salt: Optional salt (generated if not provided)
+            key: Ready-made 256-bit key (skips PBKDF2, see for_sender)
         """
         self.salt = salt or os.urandom(16)
         
         # Derive a 256-bit key using PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=self.salt,
-            iterations=100000,  # Balance security and speed
-        )
-        self.key = kdf.derive(password.encode('utf-8'))
+        self.key = key or _derive_key(password.encode('utf-8'), self.salt)
         self.aesgcm = AESGCM(self.key)
+        
+        # Everyone in a room shares the key, so each cipher counts under its
+        # own random prefix rather than reading 12 bytes of urandom per frame
+        self._nonce_prefix = os.urandom(8)
+        self._ctr = 0
+        self._streams = {}  # {sender: AESCipher}, see for_sender
+        
+        # Receive side: newest nonce accepted, and prefixes the sender has moved on from
+        self._rx_prefix = None
+        self._rx_ctr = -1
+        self._rx_retired = set()
+        
+        # The UDP and TCP receive threads and the capture thread share
+        # ciphers; guards _streams and the _rx_* replay window
+        self._lock = threading.Lock()
+    
+    def next_nonce(self) -> bytes:
+        """Return a fresh 12-byte nonce (never repeats for this cipher)."""
+        if self._ctr > NONCE_COUNTER_LIMIT:
+            self._nonce_prefix = os.urandom(8)
+            self._ctr = 0
+        nonce = NONCE.pack(self._nonce_prefix, self._ctr)
+        self._ctr += 1
+        return nonce
     
     def encrypt(self, plaintext: bytes, associated_data: bytes = None) -> bytes:
         """
@@ -107,10 +217,28 @@ class AESCipher:
         
         Returns: nonce (12 bytes) + ciphertext + tag
         """
-        nonce = os.urandom(12)
+        nonce = self.next_nonce()
         ciphertext = self.aesgcm.encrypt(nonce, plaintext, associated_data)
         return nonce + ciphertext
     
+    def encrypt_frame(self, plaintext: bytes) -> bytes:
+        """Encrypt one audio frame (no associated data): nonce + ciphertext + tag."""
+        nonce = self.next_nonce()
+        return nonce + self.aesgcm.encrypt(nonce, plaintext, None)
+    
+    def encrypt_frame_into(self, plaintext: bytes, out: bytearray) -> memoryview:
+        """
+        Encrypt one audio frame into out, which must hold
+        NONCE_SIZE + len(plaintext) + TAG_SIZE bytes.
+        
+        Returns a view of nonce + ciphertext + tag inside out.
+        """
+        view = memoryview(out)[:NONCE_SIZE + len(plaintext) + TAG_SIZE]
+        nonce = self.next_nonce()
+        view[:NONCE_SIZE] = nonce
+        self.aesgcm.encrypt_into(nonce, plaintext, None, view[NONCE_SIZE:])
+        return view
+    
     def decrypt(self, encrypted: bytes, associated_data: bytes = None) -> bytes:
         """
         Decrypt AES-256-GCM encrypted data.
@@ -124,6 +252,67 @@ class AESCipher:
         ciphertext = encrypted[12:]
         return self.aesgcm.decrypt(nonce, ciphertext, associated_data)
     
+    def decrypt_frame(self, encrypted) -> bytes:
+        """
+        Decrypt one audio frame from this cipher's stream.
+        
+        Frames too short to hold a nonce and tag, and frames whose counter
+        does not move forward (replayed or arriving late), return b''
+        without reaching OpenSSL. Raises InvalidTag on forged frames.
+        """
+        if len(encrypted) < NONCE_SIZE + TAG_SIZE:
+            return b''
+        
+        prefix, ctr = NONCE.unpack_from(encrypted)
+        with self._lock:
+            if self._rx_stale(prefix, ctr):
+                return b''
+        
+        # Decrypt outside the lock so both receive threads can run OpenSSL at once
+        plaintext = self.aesgcm.decrypt(encrypted[:NONCE_SIZE], encrypted[NONCE_SIZE:], None)
+        
+        # Only authenticated frames move the window. Check again: the other
+        # receive thread may have accepted this nonce (or a newer one) meanwhile
+        with self._lock:
+            if self._rx_stale(prefix, ctr):
+                return b''
+            if prefix != self._rx_prefix:
+                if self._rx_prefix is not None:
+                    self._rx_retired.add(self._rx_prefix)
+                self._rx_prefix = prefix
+            self._rx_ctr = ctr
+        return plaintext
+    
+    def _rx_stale(self, prefix: bytes, ctr: int) -> bool:
+        """True if this nonce was already accepted or superseded. Caller holds _lock."""
+        if prefix == self._rx_prefix:
+            return ctr <= self._rx_ctr
+        return prefix in self._rx_retired
+    
+    def derive_subkey(self, info: bytes) -> bytes:
+        """Expand this cipher's key into an independent 256-bit key with HKDF-SHA256."""
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=info)
+        return hkdf.derive(self.key)
+    
+    def for_sender(self, sender: str) -> 'AESCipher':
+        """
+        Cipher for one sender's voice stream (derived once, then cached).
+        
+        Each sender encrypts under its own subkey, so senders never share
+        a GCM nonce space, and a new participant costs one HKDF expand
+        rather than another PBKDF2 run.
+        """
+        cipher = self._streams.get(sender)
+        if cipher is None:
+            with self._lock:
+                # Another thread may have derived it while we waited
+                cipher = self._streams.get(sender)
+                if cipher is None:
+                    info = VOICE_STREAM_INFO + sender.encode('utf-8')
+                    cipher = AESCipher(salt=self.salt, key=self.derive_subkey(info))
+                    self._streams[sender] = cipher
+        return cipher
+    
     def get_salt_b64(self) -> str:
         """Get salt as base64 string for sharing."""
         return base64.b64encode(self.salt).decode('utf-8')
@@ -135,6 +324,42 @@ class AESCipher:
         return cls(password, salt)
 
 
+# --- AUDIO CODEC ---
+
+def _ulaw_to_linear(code: int) -> int:
+    """Expand one G.711 mu-law byte to a 16-bit sample."""
+    code = ~code & 0xFF
+    magnitude = ((((code & 0x0F) << 3) + 0x84) << ((code >> 4) & 0x07)) - 0x84
+    return -magnitude if code & 0x80 else magnitude
+
+
+ULAW_DECODE_TABLE = array('h', [_ulaw_to_linear(code) for code in range(256)])
+
+
+def encode_audio(pcm: bytes) -> bytes:
+    """Prepare a captured PCM frame for encryption, mu-law coded when possible."""
+    if ULAW_AVAILABLE:
+        return CODEC_ULAW + audioop.lin2ulaw(pcm, 2)
+    return CODEC_PCM16 + pcm
+
+
+def decode_audio(payload: bytes) -> bytes:
+    """Turn a decrypted voice payload back into 16-bit PCM (b'' if unknown)."""
+    codec = payload[:1]
+    
+    if codec == CODEC_ULAW:
+        if ULAW_AVAILABLE:
+            return audioop.ulaw2lin(payload[1:], 2)
+        if NUMPY_AVAILABLE:
+            table = np.frombuffer(ULAW_DECODE_TABLE, dtype=np.int16)
+            return table[np.frombuffer(payload, dtype=np.uint8, offset=1)].tobytes()
+        return array('h', [ULAW_DECODE_TABLE[code] for code in payload[1:]]).tobytes()
+    
+    if codec == CODEC_PCM16:
+        return payload[1:]
+    return b''
+
+
 # --- AUDIO HANDLER ---
 
 class AudioHandler:
@@ -148,9 +373,16 @@ class AudioHandler:
         self.is_playing = False
         self.audio_level = 0
         
-        # Playback buffer for mixing multiple streams
-        self.playback_buffers = defaultdict(list)
+        # Playback buffer for mixing multiple streams: {source_id: deque of PCM}
+        self.playback_buffers = defaultdict(lambda: deque(maxlen=PLAYBACK_QUEUE_FRAMES))
         self.playback_lock = threading.Lock()
+        self.playback_ready = threading.Condition(self.playback_lock)
+        self.playback_thread = None
+        
+        # Frames handed over by the PortAudio capture callback; the input
+        # stream stays open and frames are only kept while capture is enabled
+        self.capture_queue = queue.Queue(maxsize=CAPTURE_QUEUE_FRAMES)
+        self.capture_enabled = False
         
         if AUDIO_AVAILABLE:
             self.pyaudio = pyaudio.PyAudio()
@@ -175,6 +407,57 @@ class AudioHandler:
             print(f"Failed to start audio input: {e}")
             return False
     
+    def capture_callback(self, in_data, frame_count, time_info, status):
+        """
+        PortAudio input callback: queue the frame and return at once.
+        
+        Runs on PortAudio's thread, so it never encrypts or touches the
+        network; when the worker falls behind the oldest frame is dropped.
+        """
+        if not self.capture_enabled:
+            return (None, pyaudio.paContinue)
+        
+        try:
+            self.capture_queue.put_nowait(in_data)
+        except queue.Full:
+            try:
+                self.capture_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.capture_queue.put_nowait(in_data)
+        return (None, pyaudio.paContinue)
+    
+    def set_capture(self, enabled: bool):
+        """Start or stop keeping captured frames (the stream stays open)."""
+        if enabled and not self.capture_enabled:
+            # Don't send leftovers from the previous utterance
+            while self.read_frame(0) is not None:
+                pass
+        self.capture_enabled = enabled
+    
+    def read_frame(self, timeout: float = None):
+        """Take the next captured frame, or None if none arrived in time."""
+        try:
+            return self.capture_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def stop_input(self):
+        """Stop audio capture and discard queued frames."""
+        self.is_recording = False
+        self.capture_enabled = False
+        
+        if self.input_stream:
+            try:
+                self.input_stream.stop_stream()
+                self.input_stream.close()
+            except:
+                pass
+            self.input_stream = None
+        
+        while self.read_frame(0) is not None:
+            pass
+    
     def start_output(self):
         """Start audio playback."""
         if not self.pyaudio:
@@ -189,6 +472,8 @@ class AudioHandler:
                 frames_per_buffer=CHUNK_SIZE
             )
             self.is_playing = True
+            self.playback_thread = threading.Thread(target=self.playback_loop, daemon=True)
+            self.playback_thread.start()
             return True
         except Exception as e:
             print(f"Failed to start audio output: {e}")
@@ -197,23 +482,65 @@ class AudioHandler:
     def play_audio(self, audio_data: bytes, source_id: str = "default"):
         """Queue audio data for playback."""
         if self.output_stream and self.is_playing:
+            with self.playback_ready:
+                self.playback_buffers[source_id].append(audio_data)
+                self.playback_ready.notify()
+    
+    def playback_loop(self):
+        """Mix one frame from every speaker per tick and write it out."""
+        while self.is_playing:
+            with self.playback_ready:
+                while self.is_playing and not any(self.playback_buffers.values()):
+                    self.playback_ready.wait(0.5)
+                
+                frames = []
+                for source_id in list(self.playback_buffers):
+                    pending = self.playback_buffers[source_id]
+                    if pending:
+                        frames.append(pending.popleft())
+                    else:
+                        del self.playback_buffers[source_id]
+            
+            if not frames:
+                continue
+            
+            # The blocking write paces this loop at the sample rate
             try:
-                self.output_stream.write(audio_data)
+                self.output_stream.write(frames[0] if len(frames) == 1 else self.mix_frames(frames))
             except Exception as e:
-                print(f"Playback error: {e}")
+                if self.is_playing:
+                    print(f"Playback error: {e}")
+    
+    def mix_frames(self, frames: list) -> bytes:
+        """Sum int16 PCM frames sample by sample, clipping to 16 bits."""
+        if NUMPY_AVAILABLE:
+            acc = np.zeros(CHUNK_SIZE, dtype=np.int32)
+            for pcm in frames:
+                samples = np.frombuffer(pcm, dtype=np.int16, count=min(len(pcm) // 2, CHUNK_SIZE))
+                acc[:samples.size] += samples
+            np.clip(acc, -32768, 32767, out=acc)
+            return acc.astype(np.int16).tobytes()
+        
+        acc = [0] * CHUNK_SIZE
+        for pcm in frames:
+            samples = array('h')
+            samples.frombytes(pcm[:min(len(pcm), CHUNK_SIZE * 2) & ~1])
+            for i, sample in enumerate(samples):
+                acc[i] += sample
+        return array('h', [max(-32768, min(32767, v)) for v in acc]).tobytes()
     
     def stop(self):
         """Stop all audio streams."""
-        self.is_recording = False
-        self.is_playing = False
+        self.stop_input()
         
-        if self.input_stream:
-            try:
-                self.input_stream.stop_stream()
-                self.input_stream.close()
-            except:
-                pass
-            self.input_stream = None
+        with self.playback_ready:
+            self.is_playing = False
+            self.playback_buffers.clear()
+            self.playback_ready.notify_all()
+        
+        if self.playback_thread:
+            self.playback_thread.join(timeout=1)
+            self.playback_thread = None
         
         if self.output_stream:
             try:
@@ -235,6 +562,12 @@ class AudioHandler:
         if len(audio_data) < 2:
             return 0
         
+        if NUMPY_AVAILABLE:
+            samples = np.frombuffer(audio_data, dtype=np.int16, count=len(audio_data) // 2)
+            samples = samples.astype(np.float64)
+            rms = float(np.sqrt(np.dot(samples, samples) / samples.size))
+            return min(100, (rms / 32768) * 200)
+        
         # Convert bytes to samples
         samples = struct.unpack(f'{len(audio_data)//2}h', audio_data)
         
@@ -252,7 +585,7 @@ class AudioHandler:
 class VoiceRoom:
     """Represents a voice call room (1-on-1 or group)."""
     
-    def __init__(self, room_id: str, password: str, is_creator: bool = False):
+    def __init__(self, room_id: str, password: str, is_creator: bool = False, salt_b64: str = None):
         self.room_id = room_id
         self.password = password
         self.is_creator = is_creator
@@ -260,30 +593,76 @@ class VoiceRoom:
         self.cipher = None
         self.salt = None
         
-        if CRYPTO_AVAILABLE:
+        # Outgoing datagrams are assembled here (see encrypt_voice_datagram)
+        header_room = 1 + VOICE_HEADER.size + 2 * MAX_NAME_BYTES
+        self._out = bytearray(header_room + NONCE_SIZE + CHUNK_SIZE * 2 + TAG_SIZE)
+        self._prefix_sender = None
+        self._prefix = b''     # b"V" + header slot + room_id + sender
+        self._name_lens = (0, 0)
+        
+        # Only the creator picks a salt; joiners derive the key once the
+        # creator's salt arrives instead of deriving a throwaway key first
+        if salt_b64:
+            self.set_salt(salt_b64)
+        elif CRYPTO_AVAILABLE and is_creator:
             self.cipher = AESCipher(password)
             self.salt = self.cipher.get_salt_b64()
     
     def set_salt(self, salt_b64: str):
         """Set salt received from room creator."""
-        if CRYPTO_AVAILABLE:
+        if CRYPTO_AVAILABLE and salt_b64 != self.salt:
             self.cipher = AESCipher.from_salt_b64(self.password, salt_b64)
             self.salt = salt_b64
     
-    def encrypt_audio(self, audio_data: bytes) -> bytes:
-        """Encrypt audio data for transmission."""
+    def encrypt_voice_datagram(self, audio_data: bytes, sender: str) -> bytes:
+        """
+        Encrypt audio data from sender into a voice datagram: b"V" + voice
+        frame (empty until the key is known).
+        
+        Header, names and ciphertext are written in place into a per-room
+        buffer; the returned copy is the only allocation per frame.
+        """
         if self.cipher:
-            return self.cipher.encrypt(audio_data)
-        return audio_data
+            ct_len = NONCE_SIZE + len(audio_data) + TAG_SIZE
+        elif CRYPTO_AVAILABLE:
+            return b''
+        else:
+            ct_len = len(audio_data)
+        
+        # room_id and sender rarely change, so their bytes are built once
+        if sender != self._prefix_sender:
+            room_bytes = self.room_id.encode("utf-8")
+            sender_bytes = sender.encode("utf-8")
+            self._prefix = b"V" + bytes(VOICE_HEADER.size) + room_bytes + sender_bytes
+            self._name_lens = (len(room_bytes), len(sender_bytes))
+            self._prefix_sender = sender
+        
+        start = len(self._prefix)
+        end = start + ct_len
+        if len(self._out) < end:
+            self._out = bytearray(end)
+        out = memoryview(self._out)
+        out[:start] = self._prefix
+        VOICE_HEADER.pack_into(out, 1, *self._name_lens, ct_len)
+        
+        if not self.cipher:
+            out[start:end] = audio_data
+        elif AEAD_INTO_AVAILABLE:
+            self.cipher.for_sender(sender).encrypt_frame_into(audio_data, out[start:])
+        else:
+            out[start:end] = self.cipher.for_sender(sender).encrypt_frame(audio_data)
+        return bytes(out[:end])
     
-    def decrypt_audio(self, encrypted_data: bytes) -> bytes:
-        """Decrypt received audio data."""
+    def decrypt_audio(self, encrypted_data: bytes, sender: str) -> bytes:
+        """Decrypt received audio data from sender."""
         if self.cipher:
             try:
-                return self.cipher.decrypt(encrypted_data)
+                return self.cipher.for_sender(sender).decrypt_frame(encrypted_data)
             except Exception as e:
                 print(f"Decryption error: {e}")
                 return b''
+        if CRYPTO_AVAILABLE:
+            return b''
         return encrypted_data
     
     def add_participant(self, user_id: str):
@@ -295,6 +674,100 @@ class VoiceRoom:
         self.participants.discard(user_id)
 
 
+# --- FRAMING ---
+
+class FrameReader:
+    """
+    Buffered reader for the framed TCP stream from the server.
+    
+    Each recv_into() takes whatever the kernel has ready, so a burst of
+    small voice frames costs one syscall rather than two per frame.
+    Payloads are memoryviews into the buffer and are only valid until
+    the next read_frame() call.
+    """
+    
+    def __init__(self, sock):
+        self.sock = sock
+        self.buf = bytearray(STREAM_BUFFER_SIZE)
+        self.view = memoryview(self.buf)
+        self.start = 0  # First unparsed byte
+        self.end = 0    # End of received data
+    
+    def read_frame(self):
+        """Read one (tag, payload) frame, or return None on disconnect."""
+        if self.start == self.end:
+            self.start = self.end = 0
+        
+        if not self.fill(FRAME_HEADER.size):
+            return None
+        tag, length = FRAME_HEADER.unpack_from(self.buf, self.start)
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"frame of {length} bytes exceeds limit")
+        
+        if not self.fill(FRAME_HEADER.size + length):
+            return None
+        payload_start = self.start + FRAME_HEADER.size
+        self.start = payload_start + length
+        return tag, self.view[payload_start:self.start]
+    
+    def fill(self, size: int) -> bool:
+        """Buffer at least size unparsed bytes; False if the peer closed first."""
+        while self.end - self.start < size:
+            if self.start + size > len(self.buf):
+                # Move the partial frame to the front, growing for large frames
+                pending = self.end - self.start
+                if size > len(self.buf):
+                    buf = bytearray(size)
+                    buf[:pending] = self.view[self.start:self.end]
+                    self.buf, self.view = buf, memoryview(buf)
+                else:
+                    self.buf[:pending] = bytes(self.view[self.start:self.end])
+                self.start, self.end = 0, pending
+            
+            count = self.sock.recv_into(self.view[self.end:])
+            if not count:
+                return False
+            self.end += count
+        return True
+
+
+def mark_voice_socket(sock):
+    """Ask the network stack to queue this socket's packets as voice (best effort)."""
+    for level, name, value in (
+        (socket.SOL_SOCKET, "SO_PRIORITY", VOICE_SO_PRIORITY),
+        (socket.IPPROTO_IP, "IP_TOS", VOICE_TOS),
+    ):
+        option = getattr(socket, name, None)
+        if option is None:
+            continue
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            pass  # Not permitted on every platform
+
+
+def unpack_voice_frame(view, offset: int, end: int, own_sender: bytes = b""):
+    """
+    Split a voice frame in view[offset:end] into (room_id, sender, ciphertext).
+    
+    The ciphertext is a slice of view. Returns None if the frame is malformed
+    or was sent by own_sender, which is checked before any name is decoded.
+    """
+    if end - offset < VOICE_HEADER.size:
+        return None
+    
+    room_len, sender_len, ct_len = VOICE_HEADER.unpack_from(view, offset)
+    room_start = offset + VOICE_HEADER.size
+    room_end = room_start + room_len
+    sender_end = room_end + sender_len
+    if end != sender_end + ct_len or view[room_end:sender_end] == own_sender:
+        return None
+    
+    room_id = str(view[room_start:room_end], "utf-8", "replace")
+    sender = str(view[room_end:sender_end], "utf-8", "replace")
+    return room_id, sender, view[sender_end:end]
+
+
 # --- USERNAME LOADING ---
 
 def load_username_from_credentials(file_name=CREDENTIALS_FILE):
@@ -325,19 +798,45 @@ class VoiceClientGUI:
         
         # Network state
         self.client_socket = None
+        self.voice_socket = None   # UDP socket for voice datagrams
+        self.udp_ready = False     # Set once the server acknowledges our hello
+        self.udp_token = None
+        self.send_lock = threading.Lock()
+        self.gso_enabled = GSO_AVAILABLE
+        self.voice_batch = bytearray()   # Pending datagrams, back to back
+        self.voice_batch_count = 0
+        self.voice_batch_segment = 0
+        self.voice_batch_deadline = 0.0
+        self.tx_queue = queue.Queue(maxsize=TX_QUEUE_FRAMES)
         self.user_id = None
+        self._user_id_bytes = b""
         self.connected = False
         
         # Voice state
         self.current_room = None
         self.audio_handler = AudioHandler() if AUDIO_AVAILABLE else None
         self.is_transmitting = False
+        self.ptt_event = threading.Event()  # Set while the mic is live
         self.push_to_talk = True
         self.is_muted = False
+        self.level_pending = 0             # Latest level, drawn by the Tk thread
+        self.level_redraw_scheduled = False
+        self.level_last_drawn = 0.0
+        self.log_queue = queue.SimpleQueue()  # Timestamped lines for the Tk thread
+        self.log_flush_scheduled = False
         
         # Threads
         self.receive_thread = None
+        self.voice_thread = None
         self.audio_thread = None
+        self.tx_thread = None
+        
+        # Control messages by type (voice arrives as FRAME_VOICE frames)
+        self.message_handlers = {
+            PROTO_ROOM: self.handle_room_message,      # ROOM|cmd|...
+            PROTO_SIGNAL: self.handle_signal_message,  # SIGNAL|type|...
+            "SYSTEM": self.handle_system_message,      # SYSTEM|text
+        }
         
         self.setup_ui()
         self.check_prerequisites()
@@ -543,26 +1042,53 @@ class VoiceClientGUI:
             self.log_message("Install with: pip install " + " ".join(missing))
     
     def log_message(self, message):
-        """Add a message to the log."""
+        """Add a message to the log (safe from any thread; bursts share one redraw)."""
         timestamp = datetime.now().strftime("%H:%M:%S")
+        self.log_queue.put(f"[{timestamp}] {message}\n")
+        if self.log_flush_scheduled:
+            return  # The pending flush will pick up this line
         
-        def update():
-            self.log_text.config(state=tk.NORMAL)
-            self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
-            self.log_text.see(tk.END)
-            self.log_text.config(state=tk.DISABLED)
+        self.log_flush_scheduled = True
+        self.master.after(LOG_FLUSH_DELAY_MS, self.flush_log)
+    
+    def flush_log(self):
+        """Append all queued log lines in a single text widget update (Tk thread)."""
+        self.log_flush_scheduled = False
+        lines = []
+        while True:
+            try:
+                lines.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not lines:
+            return
         
-        self.master.after(0, update)
+        self.log_text.config(state=tk.NORMAL)
+        self.log_text.insert(tk.END, "".join(lines))
+        self.log_text.see(tk.END)
+        self.log_text.config(state=tk.DISABLED)
     
     def update_audio_level(self, level):
-        """Update the audio level meter."""
-        def update():
-            width = int(level * 2)  # Scale to canvas width
-            color = '#00ff00' if level < 70 else '#ffff00' if level < 90 else '#ff0000'
-            self.level_canvas.coords(self.level_bar, 0, 0, width, 20)
-            self.level_canvas.itemconfig(self.level_bar, fill=color)
-        
-        self.master.after(0, update)
+        """Update the audio level meter, coalescing updates to the meter's frame rate."""
+        self.level_pending = level
+        if self.level_redraw_scheduled:
+            return  # The pending redraw will pick up this level
+        
+        self.level_redraw_scheduled = True
+        elapsed = time.monotonic() - self.level_last_drawn
+        delay = max(0, LEVEL_METER_INTERVAL - elapsed)
+        self.master.after(int(delay * 1000), self.draw_audio_level)
+    
+    def draw_audio_level(self):
+        """Redraw the level meter with the latest level (Tk thread)."""
+        self.level_redraw_scheduled = False
+        self.level_last_drawn = time.monotonic()
+        level = self.level_pending
+        
+        width = int(level * 2)  # Scale to canvas width
+        color = '#00ff00' if level < 70 else '#ffff00' if level < 90 else '#ff0000'
+        self.level_canvas.coords(self.level_bar, 0, 0, width, 20)
+        self.level_canvas.itemconfig(self.level_bar, fill=color)
     
     # --- Connection Methods ---
     
@@ -576,6 +1102,10 @@ class VoiceClientGUI:
             messagebox.showwarning("Warning", "Please fill in all connection fields.")
             return
         
+        if len(username.encode("utf-8")) > MAX_NAME_BYTES or "|" in username:
+            messagebox.showwarning("Warning", "Username is too long or contains '|'.")
+            return
+        
         try:
             port = int(port_str)
         except ValueError:
@@ -586,14 +1116,27 @@ class VoiceClientGUI:
         
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            # Set before connect() so the receive window scales to match
+            self.client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+            self.client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
             self.client_socket.settimeout(10)
             self.client_socket.connect((host, port))
             
-            # Send username
-            self.client_socket.sendall(username.encode("utf-8"))
+            # Voice frames are small and latency-bound: send them immediately
+            self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            if hasattr(socket, "TCP_QUICKACK"):
+                self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            mark_voice_socket(self.client_socket)
+            
+            # Send username, asking for a framed stream
+            self.client_socket.sendall(f"{username}|FRAMED".encode("utf-8"))
             
             # Wait for response
-            response = self.client_socket.recv(1024).decode("utf-8")
+            reader = FrameReader(self.client_socket)
+            frame = reader.read_frame()
+            if frame is None:
+                raise Exception("Server closed the connection")
+            response = str(frame[1], "utf-8")
             
             if response.startswith("ERROR"):
                 error_msg = response.split("|", 1)[1] if "|" in response else response
@@ -601,6 +1144,7 @@ class VoiceClientGUI:
             
             self.client_socket.settimeout(None)
             self.user_id = username
+            self._user_id_bytes = username.encode("utf-8")
             self.connected = True
             
             # Update UI
@@ -616,12 +1160,23 @@ class VoiceClientGUI:
             self.log_message(f"Connected as '{username}'")
             
             # Start receive thread
-            self.receive_thread = threading.Thread(target=self.receive_messages, daemon=True)
+            self.receive_thread = threading.Thread(
+                target=self.receive_messages, args=(reader,), daemon=True
+            )
             self.receive_thread.start()
             
-            # Start audio output
+            # Voice goes over UDP once the server answers our hello
+            self.open_voice_socket(host, port)
+            
+            # Network sends run on their own thread so a stalled socket
+            # never holds up audio capture
+            self.tx_thread = threading.Thread(target=self.tx_loop, daemon=True)
+            self.tx_thread.start()
+            
+            # Start audio output, and open the microphone once for the session
             if self.audio_handler:
                 self.audio_handler.start_output()
+                self.start_capture()
             
         except Exception as e:
             self.log_message(f"Connection failed: {e}")
@@ -644,6 +1199,8 @@ class VoiceClientGUI:
                 pass
             self.client_socket = None
         
+        self.close_voice_socket()
+        
         if self.audio_handler:
             self.audio_handler.stop()
         
@@ -678,6 +1235,10 @@ class VoiceClientGUI:
             messagebox.showwarning("Warning", "Please enter a room password for encryption.")
             return
         
+        if len(room_id.encode("utf-8")) > MAX_NAME_BYTES:
+            messagebox.showwarning("Warning", "Room ID is too long.")
+            return
+        
         # Create room locally
         self.current_room = VoiceRoom(room_id, password, is_creator=True)
         self.current_room.add_participant(self.user_id)
@@ -699,6 +1260,10 @@ class VoiceClientGUI:
             messagebox.showwarning("Warning", "Please enter room ID and password.")
             return
         
+        if len(room_id.encode("utf-8")) > MAX_NAME_BYTES:
+            messagebox.showwarning("Warning", "Room ID is too long.")
+            return
+        
         # Create room locally (salt will be received from server)
         self.current_room = VoiceRoom(room_id, password, is_creator=False)
         self.current_room.add_participant(self.user_id)
@@ -787,9 +1352,9 @@ class VoiceClientGUI:
         self.is_transmitting = True
         self.ptt_button.config(bg='#00aa00', text="[V] TRANSMITTING...")
         
-        # Start audio capture in a thread
-        self.audio_thread = threading.Thread(target=self.audio_capture_loop, daemon=True)
-        self.audio_thread.start()
+        # The input stream is already open; just let frames through
+        self.audio_handler.set_capture(True)
+        self.ptt_event.set()
     
     def stop_transmit(self, event):
         """Stop transmitting audio."""
@@ -797,46 +1362,50 @@ class VoiceClientGUI:
             return
         
         self.is_transmitting = False
+        self.ptt_event.clear()
+        if self.audio_handler:
+            self.audio_handler.set_capture(False)
         self.ptt_button.config(bg='#333333', text="[V] PUSH TO TALK")
         self.update_audio_level(0)
     
-    def audio_capture_loop(self):
-        """Capture and send audio data."""
-        if not self.audio_handler or not self.audio_handler.pyaudio:
+    def start_capture(self):
+        """Open the input stream and start the send worker for this connection."""
+        handler = self.audio_handler
+        if not handler.start_input(handler.capture_callback):
+            self.log_message("Microphone unavailable - receive only")
             return
         
+        self.audio_thread = threading.Thread(target=self.audio_capture_loop, daemon=True)
+        self.audio_thread.start()
+    
+    def audio_capture_loop(self):
+        """Encrypt audio frames captured by the PortAudio callback and queue them for sending."""
+        handler = self.audio_handler
+        me = threading.current_thread()
+        
         try:
-            stream = self.audio_handler.pyaudio.open(
-                format=FORMAT,
-                channels=CHANNELS,
-                rate=RATE,
-                input=True,
-                frames_per_buffer=CHUNK_SIZE
-            )
-            
-            while self.is_transmitting and self.current_room:
+            while self.connected and self.audio_thread is me:
+                # Sleep until push-to-talk, waking periodically to notice disconnects
+                if not self.ptt_event.wait(timeout=0.5):
+                    continue
+                
                 try:
-                    audio_data = stream.read(CHUNK_SIZE, exception_on_overflow=False)
+                    audio_data = handler.read_frame(timeout=AUDIO_PACKET_INTERVAL * 4)
+                    if audio_data is None or not self.ptt_event.is_set() or not self.current_room:
+                        continue
                     
                     # Update level meter
                     level = self.audio_handler.calculate_level(audio_data)
                     self.update_audio_level(level)
                     
-                    # Encrypt and send
-                    encrypted = self.current_room.encrypt_audio(audio_data)
-                    encoded = base64.b64encode(encrypted).decode('utf-8')
-                    
-                    # Format: VOICE|room_id|sender|encoded_audio
-                    msg = f"{PROTO_VOICE}|{self.current_room.room_id}|{self.user_id}|{encoded}"
-                    self.send_to_server(msg)
+                    # Encrypt and hand off to the sender thread
+                    datagram = self.current_room.encrypt_voice_datagram(encode_audio(audio_data), self.user_id)
+                    if datagram:
+                        self.queue_voice_datagram(datagram)
                     
                 except Exception as e:
                     if self.is_transmitting:
                         self.log_message(f"Audio error: {e}")
-                    break
-            
-            stream.stop_stream()
-            stream.close()
             
         except Exception as e:
             self.log_message(f"Failed to capture audio: {e}")
@@ -873,33 +1442,221 @@ class VoiceClientGUI:
     # --- Network Methods ---
     
     def send_to_server(self, message):
-        """Send a message to the relay server."""
-        if not self.client_socket or not self.connected:
+        """Send a protocol message to the relay server."""
+        self.send_frame(FRAME_TEXT, message.encode("utf-8"))
+    
+    def send_frame(self, tag, payload):
+        """Send one length-prefixed frame to the relay server."""
+        sock = self.client_socket
+        if not sock or not self.connected:
             return
         
         try:
-            # For voice protocol, send to special handler
-            # Format: _VOICE_TARGET_|room_id|content
-            self.client_socket.sendall(message.encode("utf-8"))
+            # The Tk thread and the sender thread both send on this socket
+            with self.send_lock:
+                sock.sendall(FRAME_HEADER.pack(tag, len(payload)) + payload)
         except Exception as e:
             self.log_message(f"Send error: {e}")
     
-    def receive_messages(self):
+    def queue_voice_datagram(self, datagram):
+        """Queue a voice datagram for the sender thread, dropping the oldest if it is behind."""
+        try:
+            self.tx_queue.put_nowait(datagram)
+        except queue.Full:
+            try:
+                self.tx_queue.get_nowait()  # Late voice is worthless; keep the newest
+            except queue.Empty:
+                pass
+            self.tx_queue.put_nowait(datagram)
+    
+    def tx_loop(self):
+        """Background thread that sends queued voice frames."""
+        me = threading.current_thread()
+        self.voice_batch.clear()
+        self.voice_batch_count = 0
+        
+        # Frames left over from a previous connection are stale
+        while not self.tx_queue.empty():
+            self.tx_queue.get_nowait()
+        
+        while self.connected and self.tx_thread is me:
+            try:
+                datagram = self.tx_queue.get(timeout=self.voice_batch_timeout())
+            except queue.Empty:
+                if self.voice_batch_count and time.monotonic() >= self.voice_batch_deadline:
+                    self.flush_voice_batch()
+                continue
+            
+            self.send_voice_datagram(datagram)
+    
+    def send_voice_datagram(self, datagram):
+        """Send a voice datagram over UDP when the server has acknowledged us, else over TCP."""
+        # Fragmented datagrams are lost whole if any piece is, so big frames
+        # (long names, uncompressed PCM) take the TCP path instead
+        if self.udp_ready and len(datagram) <= MAX_DATAGRAM_SEND:
+            try:
+                if self.gso_enabled:
+                    self.batch_voice_datagram(datagram)
+                else:
+                    self.voice_socket.send(datagram)
+                return
+            except (OSError, AttributeError):
+                pass  # Socket went away; fall through to TCP
+        
+        self.send_frame(FRAME_VOICE, memoryview(datagram)[1:])
+    
+    def batch_voice_datagram(self, datagram):
+        """Add a datagram to the GSO batch, sending it when full or due."""
+        if self.voice_batch_count and len(datagram) != self.voice_batch_segment:
+            self.flush_voice_batch()  # GSO needs equal-size segments
+        
+        if not self.voice_batch_count:
+            self.voice_batch_segment = len(datagram)
+            self.voice_batch_deadline = time.monotonic() + VOICE_BATCH_DELAY
+        
+        self.voice_batch += datagram
+        self.voice_batch_count += 1
+        
+        if self.voice_batch_count >= VOICE_BATCH_FRAMES or time.monotonic() >= self.voice_batch_deadline:
+            self.flush_voice_batch()
+    
+    def voice_batch_timeout(self):
+        """How long the sender thread may wait for the next frame."""
+        if self.voice_batch_count:
+            return max(0.0, self.voice_batch_deadline - time.monotonic())
+        return AUDIO_PACKET_INTERVAL * 4
+    
+    def flush_voice_batch(self):
+        """Send all batched datagrams in a single sendmsg() with UDP_SEGMENT."""
+        if not self.voice_batch_count:
+            return
+        
+        batch = bytes(self.voice_batch)
+        segment = self.voice_batch_segment
+        count = self.voice_batch_count
+        self.voice_batch.clear()
+        self.voice_batch_count = 0
+        
+        sock = self.voice_socket
+        if not sock:
+            return
+        
+        try:
+            if count == 1:
+                sock.send(batch)
+                return
+            if self.gso_enabled:
+                try:
+                    sock.sendmsg(
+                        [batch], [(socket.SOL_UDP, UDP_SEGMENT, struct.pack("H", segment))]
+                    )
+                    return
+                except OSError as e:
+                    # Old kernel or no offload on this route; stop batching
+                    self.gso_enabled = False
+                    self.log_message(f"UDP GSO unavailable ({e}), sending frames singly")
+            for offset in range(0, len(batch), segment):
+                sock.send(batch[offset:offset + segment])
+        except OSError:
+            pass  # Voice is best effort
+    
+    def open_voice_socket(self, host, port):
+        """Open the UDP voice socket and start the datagram receive thread."""
+        try:
+            self.voice_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.voice_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+            self.voice_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+            self.voice_socket.connect((host, port))
+            self.voice_socket.settimeout(UDP_HELLO_INTERVAL)
+            mark_voice_socket(self.voice_socket)
+        except OSError as e:
+            self.log_message(f"UDP voice unavailable ({e}), using TCP")
+            self.voice_socket = None
+            return
+        
+        # The token ties our UDP address to this TCP session on the server
+        self.udp_ready = False
+        self.udp_token = os.urandom(16).hex()
+        self.send_to_server(f"{PROTO_UDP}|{self.udp_token}")
+        
+        self.voice_thread = threading.Thread(
+            target=self.receive_voice_datagrams, args=(self.voice_socket,), daemon=True
+        )
+        self.voice_thread.start()
+    
+    def close_voice_socket(self):
+        """Close the UDP voice socket; voice falls back to TCP."""
+        self.udp_ready = False
+        if self.voice_socket:
+            try:
+                self.voice_socket.close()
+            except:
+                pass
+            self.voice_socket = None
+    
+    def receive_voice_datagrams(self, sock):
+        """Background thread to register with the server and receive voice datagrams."""
+        hello = b"H" + self.udp_token.encode("utf-8")
+        attempts = 0
+        
+        # One buffer for the life of the socket; frames are decrypted straight
+        # out of it, so nothing is allocated per datagram until the plaintext
+        buf = bytearray(DATAGRAM_SIZE)
+        view = memoryview(buf)
+        
+        while self.connected and self.voice_socket is sock:
+            if not self.udp_ready and attempts < UDP_HELLO_ATTEMPTS:
+                attempts += 1
+                try:
+                    sock.send(hello)
+                except OSError:
+                    pass
+            
+            try:
+                length = sock.recv_into(buf)
+            except (socket.timeout, ConnectionRefusedError):
+                if attempts == UDP_HELLO_ATTEMPTS and not self.udp_ready:
+                    attempts += 1
+                    self.log_message("No UDP reply from server, voice stays on TCP")
+                continue
+            except OSError:
+                break
+            
+            if not length:
+                continue
+            
+            kind = buf[0]
+            
+            if kind == ord("V"):
+                frame = unpack_voice_frame(view, 1, length, self._user_id_bytes)
+                if frame:
+                    self.handle_voice_data(*frame)
+            
+            elif kind == ord("A") and not self.udp_ready:
+                self.udp_ready = True
+                self.log_message("Voice path: UDP")
+    
+    def receive_messages(self, reader):
         """Background thread to receive messages."""
         while self.connected and self.client_socket:
             try:
-                data = self.client_socket.recv(65536)  # Larger buffer for audio
-                if not data:
+                frame = reader.read_frame()
+                if frame is None:
                     break
                 
-                message = data.decode("utf-8")
-                self.process_received_message(message)
+                tag, payload = frame
+                if tag == FRAME_VOICE:
+                    voice = unpack_voice_frame(payload, 0, len(payload), self._user_id_bytes)
+                    if voice:
+                        self.handle_voice_data(*voice)
+                elif tag == FRAME_TEXT:
+                    self.process_received_message(str(payload, "utf-8"))
                 
             except ConnectionResetError:
                 break
             except Exception as e:
                 if self.connected:
-                    self.master.after(0, lambda: self.log_message(f"Receive error: {e}"))
+                    self.log_message(f"Receive error: {e}")
                 break
         
         if self.connected:
@@ -913,40 +1670,29 @@ class VoiceClientGUI:
             if len(parts) < 2:
                 return
             
-            msg_type = parts[0]
-            
-            if msg_type == PROTO_VOICE:
-                # Voice data: VOICE|room_id|sender|encoded_audio
-                if len(parts) >= 4:
-                    room_id, sender, encoded = parts[1], parts[2], parts[3]
-                    self.handle_voice_data(room_id, sender, encoded)
-            
-            elif msg_type == PROTO_ROOM:
-                # Room management: ROOM|cmd|...
-                self.handle_room_message(parts[1:])
-            
-            elif msg_type == PROTO_SIGNAL:
-                # Signaling: SIGNAL|type|...
-                self.handle_signal_message(parts[1:])
-            
-            elif msg_type == "SYSTEM":
-                # System message
-                self.master.after(0, lambda: self.log_message(f"System: {parts[1]}"))
+            handler = self.message_handlers.get(parts[0])
+            if handler:
+                handler(parts[1:])
             
         except Exception as e:
             self.log_message(f"Message parse error: {e}")
     
-    def handle_voice_data(self, room_id, sender, encoded):
-        """Handle received voice data."""
+    def handle_system_message(self, args):
+        """Show a message from the server."""
+        self.log_message(f"System: {args[0]}")
+    
+    def handle_voice_data(self, room_id, sender, encrypted):
+        """
+        Handle received (still encrypted) voice data.
+        
+        encrypted may be a memoryview into a receive buffer that is reused
+        once this returns, so it must not be kept.
+        """
         if not self.current_room or self.current_room.room_id != room_id:
             return
         
-        if sender == self.user_id:
-            return  # Don't play back our own audio
-        
         try:
-            encrypted = base64.b64decode(encoded)
-            audio_data = self.current_room.decrypt_audio(encrypted)
+            audio_data = decode_audio(self.current_room.decrypt_audio(encrypted, sender))
             
             if audio_data and self.audio_handler:
                 self.audio_handler.play_audio(audio_data, sender)
@@ -966,7 +1712,7 @@ class VoiceClientGUI:
                 user = parts[1]
                 self.current_room.add_participant(user)
                 self.master.after(0, self.update_room_ui)
-                self.master.after(0, lambda: self.log_message(f"{user} joined the room"))
+                self.log_message(f"{user} joined the room")
         
         elif cmd == "LEFT":
             # User left: LEFT|user_id
@@ -974,14 +1720,14 @@ class VoiceClientGUI:
                 user = parts[1]
                 self.current_room.remove_participant(user)
                 self.master.after(0, self.update_room_ui)
-                self.master.after(0, lambda: self.log_message(f"{user} left the room"))
+                self.log_message(f"{user} left the room")
         
         elif cmd == "SALT":
             # Salt received: SALT|salt_b64
             if len(parts) >= 2 and self.current_room:
                 self.current_room.set_salt(parts[1])
                 self.master.after(0, self.update_room_ui)
-                self.master.after(0, lambda: self.log_message("Joined room successfully"))
+                self.log_message("Joined room successfully")
         
         elif cmd == "MEMBERS":
             # Member list: MEMBERS|user1,user2,user3
@@ -1001,7 +1747,7 @@ class VoiceClientGUI:
         elif cmd == "ERROR":
             # Error message
             if len(parts) >= 2:
-                self.master.after(0, lambda: self.log_message(f"Room error: {parts[1]}"))
+                self.log_message(f"Room error: {parts[1]}")
                 if self.current_room and not self.current_room.is_creator:
                     self.current_room = None
                     self.master.after(0, self.update_room_ui)
@@ -1026,8 +1772,7 @@ class VoiceClientGUI:
             )
             
             if password:
-                self.current_room = VoiceRoom(room_id, password, is_creator=False)
-                self.current_room.set_salt(salt)
+                self.current_room = VoiceRoom(room_id, password, is_creator=False, salt_b64=salt)
                 self.current_room.add_participant(self.user_id)
                 
                 # Send join command
@@ -1039,9 +1784,11 @@ class VoiceClientGUI:
     
     def handle_disconnect(self):
         """Handle unexpected disconnection."""
+        self.stop_transmit(None)
         self.connected = False
         self.client_socket = None
         self.current_room = None
+        self.close_voice_socket()
         
         if self.audio_handler:
             self.audio_handler.stop()
@@ -1069,6 +1816,8 @@ class VoiceClientGUI:
                 self.client_socket.close()
             except:
                 pass
+        
+        self.close_voice_socket()
 
 
 def show_disclaimer():